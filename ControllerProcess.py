@@ -0,0 +1,158 @@
+# --------------- Python Libraries --------------------------------------------
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class SharedFrame:
+    """
+    A float64 record in shared memory guarded by a sequence counter, so one
+    process can write while the other reads. The counter is odd during a write,
+    a reader retries until it sees the same even count before and after copying.
+    """
+
+    def __init__(self, size, name=None):
+        create = name is None
+        self.shm = SharedMemory(name=name, create=create, size=8 * (size + 1))
+        self.sequence = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.values = np.ndarray((size,), dtype=np.float64, buffer=self.shm.buf, offset=8)
+        if create:
+            self.sequence[0] = 0
+
+    def write(self, *parts):
+        self.sequence[0] += 1
+        offset = 0
+        for part in parts:
+            part = np.ravel(part)
+            self.values[offset : offset + len(part)] = part
+            offset += len(part)
+        self.sequence[0] += 1
+
+    def read(self):
+        """A consistent copy of the values, and the sequence count it was read at"""
+        while True:
+            before = self.sequence[0]
+            if before % 2 == 0:
+                values = self.values.copy()
+                if self.sequence[0] == before:
+                    return int(before), values
+
+    def close(self, unlink=False):
+        del self.sequence, self.values
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def run_worker(controller, agent_count, input_name, output_name, input_ready, output_ready, stop):
+    """Worker process: evaluate the latest positions whenever new ones are posted"""
+    inputs = SharedFrame(2 + 2 * agent_count, input_name)
+    outputs = SharedFrame(2 + 4 * agent_count, output_name)
+    try:
+        while not stop.is_set():
+            if not input_ready.acquire(timeout=0.1):
+                continue
+            # Only the latest positions matter if several were posted meanwhile
+            while input_ready.acquire(block=False):
+                pass
+            _, values = inputs.read()
+            t, submitted, positions_flat = values[0], values[1], values[2:]
+            u = controller.control_law(positions_flat.reshape(agent_count, 2).T, t)
+            outputs.write(t, submitted, positions_flat, u)
+            output_ready.release()
+    except Exception as e:
+        print(f"ERROR: Controller process stopped: {e!r}")
+        raise
+    finally:
+        inputs.close()
+        outputs.close()
+
+
+class ControllerProcess:
+    """
+    Evaluates a FormationController's control law in a separate worker process,
+    so heavy control laws do not hold the GIL against the NatNet and radio
+    threads. Positions go in and control outputs come back through shared
+    memory, and the results are published on the controller as usual.
+
+    The worker gets a pickled copy of the controller, see
+    FormationController.__getstate__, so control_law must only depend on state
+    set up in __init__. It is spawned rather than forked, a fork of the running
+    NatNet, recorder and radio threads could inherit their locks held.
+    """
+
+    context = mp.get_context("spawn")
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.agent_count = controller.positions_flat.size // 2
+        self.inputs = SharedFrame(2 + 2 * self.agent_count)
+        self.outputs = SharedFrame(2 + 4 * self.agent_count)
+        self.input_ready = self.context.Semaphore(0)
+        self.output_ready = self.context.Semaphore(0)
+        self.stop_event = self.context.Event()
+        self.process = self.context.Process(
+            target=run_worker,
+            args=(
+                controller,
+                self.agent_count,
+                self.inputs.shm.name,
+                self.outputs.shm.name,
+                self.input_ready,
+                self.output_ready,
+                self.stop_event,
+            ),
+            name="FormationController",
+            daemon=True,
+        )
+        self.receiver = threading.Thread(
+            target=self._receive, name="ControllerProcess receiver", daemon=True
+        )
+        self.submitted_count = 0
+        self.received_count = 0
+
+    def start(self):
+        self.process.start()
+        self.receiver.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.receiver.join()
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.inputs.close(unlink=True)
+        self.outputs.close(unlink=True)
+        print(
+            f"Controller process: {self.submitted_count} frames submitted, "
+            f"{self.received_count} evaluated"
+        )
+
+    def submit(self, t, positions_flat):
+        """Post the positions of a frame, returns immediately"""
+        self.inputs.write(t, time.perf_counter(), positions_flat)
+        self.submitted_count += 1
+        self.input_ready.release()
+
+    def _receive(self):
+        n = self.agent_count
+        published = None
+        while not self.stop_event.is_set():
+            if not self.output_ready.acquire(timeout=0.1):
+                if not self.process.is_alive():
+                    print("ERROR: Controller process died, control outputs are frozen")
+                    return
+                continue
+            sequence, values = self.outputs.read()
+            if sequence == published:
+                # already read when an earlier release was taken
+                continue
+            published = sequence
+            t, submitted = values[0], values[1]
+            positions_flat = values[2 : 2 + 2 * n]
+            u = values[2 + 2 * n :].reshape(2, n)
+            self.received_count += 1
+            self.controller._publish(t, positions_flat, u, submitted)
@@ -0,0 +1,51 @@
+# --------------- Python Libraries --------------------------------------------
+import numpy as np
+
+
+class DisturbanceModel:
+    """
+    Bounded, time varying disturbances on the velocities of N agents.
+
+    Component c of the stacked (x, y) velocity vector is
+    offset[c] + amplitude[c] * sin(t + phase[c]). Agent i gets the constant a,
+    a * sin(t + i pi/10) and a * cos(t + i pi/10) in turn on its x and y, with a
+    small enough that the norm of the whole vector stays below NORM_BOUND.
+    """
+
+    NORM_BOUND = 1.0
+
+    def __init__(self, n, scale=0.99):
+        a = scale / np.sqrt(2 * n)
+
+        agent = np.repeat(np.arange(n), 2)
+        kind = (agent + np.tile([0, 1], n)) % 3  # 0 constant, 1 sine, 2 cosine
+
+        self.n = n
+        self.offset = np.where(kind == 0, a, 0.0)
+        self.amplitude = np.where(kind == 0, 0.0, a)
+        self.phase = agent * np.pi / 10 + np.where(kind == 2, np.pi / 2, 0.0)
+
+        # Every component is at most |offset| + |amplitude|, for all t
+        self.max_norm = np.linalg.norm(np.abs(self.offset) + np.abs(self.amplitude))
+        if self.max_norm >= self.NORM_BOUND:
+            raise RuntimeError(
+                f"Disturbances can reach a norm of {self.max_norm:.3f}, which exceeds the bound {self.NORM_BOUND}"
+            )
+
+    def __call__(self, t):
+        """
+        The disturbances at time t, a vector of 2N. For an array of times, one
+        row per time.
+        """
+        t = np.asarray(t, dtype=float)
+        return self.offset + self.amplitude * np.sin(t[..., None] + self.phase)
+
+
+if __name__ == "__main__":
+    for n in [1, 3, 8, 50, 500]:
+        model = DisturbanceModel(n)
+        d = model(np.linspace(0, 100, 10001))
+        print(
+            f"N={n}: shape {d.shape}, max norm {np.linalg.norm(d, axis=1).max():.4f}"
+            f" (bound {model.max_norm:.4f})"
+        )
@@ -1,7 +1,9 @@
 from pprint import pprint
 
 import numpy as np
+import scipy.sparse
 import quad_global_variables as qgv
+from DisturbanceModel import DisturbanceModel
 from Formation2D import Formation2D, get_formation
 from FormationController import FormationController
 
@@ -14,42 +16,6 @@ def sig(x, alpha):
     return np.sign(x) * (np.abs(x) ** alpha)
 
 
-def disturbances(n, t):
-    """return a np array that is guaranteed to have a norm less than 1"""
-    
-    a = 0.99 / (np.sqrt(n))
-    possible_disturbances = np.array([
-        a, a * np.sin(t + np.pi / 10),
-        a * np.cos(t + 2 * np.pi / 10), a,
-        a * np.sin(t + 3 * np.pi / 10), a * np.sin(t + 3 * np.pi / 10) ,
-        a, a * np.sin(t + 4 * np.pi / 10),
-        a * np.cos(t + 5 * np.pi / 10), a,
-        a * np.sin(t + 6 * np.pi / 10), a * np.sin(t + 6 * np.pi / 10) ,
-        a, a * np.sin(t + 7 * np.pi / 10),
-        a * np.cos(t + 8 * np.pi / 10), a,
-        a * np.sin(t + 9 * np.pi / 10), a * np.sin(t + 9 * np.pi / 10) ,
-    ])
-    disturbances = possible_disturbances[:n]
-    assert np.norm(disturbances) < 1, "Hardcoded Disturbances too large, exceed bound"
-    
-    # disturbance_functions = [
-    #     lambda _i, _t: a,
-    #     lambda i, t: a * np.sin(t + i * np.pi / 10),
-    #     lambda i, t: a * np.cos(t + i * np.pi / 10)
-    # ]
-
-    # n_disturbance_functions = len(disturbance_functions)
-
-    # disturbances = []
-    # for i in range(n):
-    #     x_i = i % n_disturbance_functions
-    #     y_i = (x_i + 1) % n_disturbance_functions
-    #     disturbances.append(disturbance_functions[x_i](i, t))
-    #     disturbances.append(disturbance_functions[y_i](i, t))
-    
-    return disturbances
-    
-
 class FixedTimeController(FormationController):
     PSI = 0.01
     ALPHA = 0.5
@@ -57,19 +23,37 @@ class FixedTimeController(FormationController):
     K1 = 0.10
     K2 = 0.10
 
+    # With "auto" FORMATION_BACKEND, formations of at least this many agents use
+    # scipy.sparse, below it the dense products are faster
+    SPARSE_MIN_AGENTS = 128
+
     def __init__(self, formation: Formation2D):
         if qgv.swarm != None:
             super().__init__(qgv.swarm)
 
         self.formation = formation
 
+        if qgv.FORMATION_BACKEND == "auto":
+            self.sparse = formation.N >= self.SPARSE_MIN_AGENTS
+        elif qgv.FORMATION_BACKEND in ("dense", "sparse"):
+            self.sparse = qgv.FORMATION_BACKEND == "sparse"
+        else:
+            raise RuntimeError(
+                f"Unknown formation backend '{qgv.FORMATION_BACKEND}', use 'auto', 'dense' or 'sparse'"
+            )
+
         I = np.eye(formation.d, dtype="int")
 
-        print("H=", formation.H)
+        if self.sparse:
+            print(f"H= {formation.M} x {formation.N}, {formation.H_sparse.nnz} nonzero, sparse")
 
-        self.H_bar = np.kron(formation.H, I)
+            self.H_bar = scipy.sparse.kron(formation.H_sparse, I, format="csr")
+        else:
+            print("H=", formation.H)
 
-        print("H_bar=", self.H_bar)
+            self.H_bar = np.kron(formation.H, I)
+
+            print("H_bar=", self.H_bar)
         self.p_des = stack_cols(formation.p_des)
 
         e_des = self.H_bar @ self.p_des
@@ -78,31 +62,55 @@ class FixedTimeController(FormationController):
         self.f_des = 0.5 * np.sum(e_des**2, axis=0).T
         self.d_des = np.linalg.norm(e_des, axis=0).T
 
+        self.disturbance = DisturbanceModel(formation.N)
+
+        # The control law works on positions as N x 2 (one row per agent), where
+        # H_bar @ stack_cols(p) is H @ p.T, so it only needs H and its transpose
+        if self.sparse:
+            self.H = formation.H_sparse.astype(float)
+            self.H_T = self.H.T.tocsr()
+        else:
+            self.H = formation.H.astype(float)
+            self.H_T = np.ascontiguousarray(self.H.T)
+
+
+    def metadata(self):
+        metadata = super().metadata()
+        metadata["gains"] = {
+            "PSI": self.PSI,
+            "ALPHA": self.ALPHA,
+            "BETA": self.BETA,
+            "K1": self.K1,
+            "K2": self.K2,
+        }
+        metadata["formation"] = {
+            "N": self.formation.N,
+            "M": self.formation.M,
+            "edges": self.formation.edges.tolist(),
+            "p_des": self.formation.p_des.tolist(),
+            "backend": "sparse" if self.sparse else "dense",
+        }
+        return metadata
 
     def control_law(self, p, t):
-        p = stack_cols(p).round(8)
-
-        e = self.H_bar @ p
-
-        f = 0.5 * np.sum(e.reshape((-1, 2)).T ** 2, axis=0)
+        p = p.T.round(8)  # N x 2
 
-        M = self.formation.M
-        R = np.zeros((M, 2 * M))
-        for j in range(M):  # j from 0 to M-1
-            R[j, 2 * j : 2 * j + 2] = e[2 * j : 2 * j + 2].T
+        e = self.H @ p  # edge vectors, M x 2
 
-        Rd = R @ self.H_bar
+        f = 0.5 * np.einsum("ij,ij->i", e, e)
 
-        delta = (f - self.f_des).T
+        delta = f - self.f_des
 
-        Rd_delta_prod = Rd.T @ delta
+        # Rd.T @ delta with Rd = R @ H_bar and R holding e_j.T on its block
+        # diagonal, is H.T @ (each e_j scaled by delta_j), stacked per agent
+        Rd_delta_prod = (self.H_T @ (e * delta[:, None])).ravel()
 
         u = (
             - self.K1 * sig(Rd_delta_prod, self.ALPHA)
             - self.K2 * sig(Rd_delta_prod, self.BETA)
             - self.PSI * np.sign(Rd_delta_prod)
         )
-        d = self.PSI * disturbances(self.formation.N, t)
+        d = self.PSI * self.disturbance(t)
         p_dot = u + d
         # pprint(p_dot)
         p_dot = p_dot.reshape(-1, 2).T
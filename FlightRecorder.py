@@ -0,0 +1,310 @@
+# --------------- Python Libraries --------------------------------------------
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+import zstandard
+
+COLUMNS = ("t", "p", "u", "setpoint")
+
+
+class CsvSink:
+    """One text row per record, with a header. Slow, but readable anywhere."""
+
+    def __init__(self, filename, agents, metadata):
+        self.f = open(filename, "w", newline="")
+        self.writer = csv.writer(self.f)
+        header = ["t"]
+        for prefix in ("", "u", "sp"):
+            for agent in agents:
+                header += [f"{prefix}x{agent}", f"{prefix}y{agent}"]
+        self.writer.writerow(header)
+
+    def write(self, t, p, u, setpoint):
+        self.writer.writerows(np.column_stack((t, p, u, setpoint)).tolist())
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class NpySink:
+    """
+    A single rows x columns float64 .npy file that np.load can memory map, with
+    the metadata and column layout in a .json file next to it. The header is
+    rewritten after every chunk, so the file is valid up to the last chunk.
+    """
+
+    HEADER_SIZE = 128  # fixed, so the header can be rewritten in place
+
+    def __init__(self, filename, agents, metadata):
+        self.f = open(filename, "wb")
+        self.column_count = 1 + 6 * len(agents)
+        self.rows = 0
+        self._write_header()
+        with open(os.path.splitext(filename)[0] + ".json", "w") as f:
+            json.dump(dict(metadata, columns=column_layout(agents)), f, indent=2)
+
+    def _write_header(self):
+        header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (
+            self.rows,
+            self.column_count,
+        )
+        self.f.seek(0)
+        self.f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", self.HEADER_SIZE - 10))
+        self.f.write(header.ljust(self.HEADER_SIZE - 11).encode("latin1") + b"\n")
+        self.f.seek(0, os.SEEK_END)
+
+    def write(self, t, p, u, setpoint):
+        self.f.write(np.column_stack((t, p, u, setpoint)).astype("<f8").tobytes())
+        self.rows += len(t)
+        self._write_header()
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class NpzSink:
+    """
+    One array per column plus the metadata as JSON in an .npz file. Chunks are
+    spooled to a .npy file while flying and packed when the recorder closes.
+    """
+
+    def __init__(self, filename, agents, metadata):
+        self.filename = filename
+        self.spool_filename = filename + ".partial.npy"
+        self.spool = NpySink(self.spool_filename, agents, metadata)
+        self.metadata = metadata
+        self.widths = [width for _, width in column_layout(agents)]
+
+    def write(self, t, p, u, setpoint):
+        self.spool.write(t, p, u, setpoint)
+
+    def close(self):
+        self.spool.close()
+        rows = np.load(self.spool_filename, mmap_mode="r")
+        columns = np.split(rows, np.cumsum(self.widths)[:-1], axis=1)
+        columns[0] = columns[0][:, 0]
+        np.savez(
+            self.filename,
+            metadata=json.dumps(self.metadata),
+            **dict(zip(COLUMNS, columns)),
+        )
+        del rows, columns
+        os.remove(self.spool_filename)
+        os.remove(os.path.splitext(self.spool_filename)[0] + ".json")
+
+
+class ZstdSink:
+    """
+    Chunked, zstd compressed columnar records. The file starts with a frame
+    holding the metadata as JSON, then one frame per chunk with each column
+    stored contiguously. Every frame is length prefixed and compressed on its
+    own, so a cut off file is readable up to the last complete chunk.
+    """
+
+    LEVEL = 3
+
+    def __init__(self, filename, agents, metadata):
+        self.f = open(filename, "wb")
+        self.compressor = zstandard.ZstdCompressor(level=self.LEVEL)
+        self._write_frame(
+            json.dumps(dict(metadata, columns=column_layout(agents))).encode("utf-8")
+        )
+
+    def _write_frame(self, data):
+        compressed = self.compressor.compress(data)
+        self.f.write(struct.pack("<I", len(compressed)) + compressed)
+
+    def write(self, t, p, u, setpoint):
+        self._write_frame(
+            b"".join(np.ascontiguousarray(c, dtype="<f8").tobytes() for c in (t, p, u, setpoint))
+        )
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+SINKS = {".csv": CsvSink, ".npy": NpySink, ".npz": NpzSink, ".zst": ZstdSink}
+
+
+def column_layout(agents):
+    """Name and width of each column"""
+    return [("t", 1), ("p", 2 * len(agents)), ("u", 2 * len(agents)), ("setpoint", 2 * len(agents))]
+
+
+def load_flight(filename):
+    """
+    Load a flight record written by FlightRecorder, returns the columns as a
+    dict of arrays (t, p, u and setpoint) and the metadata. .npy files are
+    memory mapped, CSV files have no metadata.
+    """
+    extension = os.path.splitext(filename)[1]
+    if extension == ".npz":
+        with np.load(filename) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return {name: data[name] for name in COLUMNS}, metadata
+
+    if extension == ".npy":
+        with open(os.path.splitext(filename)[0] + ".json") as f:
+            metadata = json.load(f)
+        rows = np.load(filename, mmap_mode="r")
+    elif extension == ".zst":
+        decompressor = zstandard.ZstdDecompressor()
+        frames = []
+        with open(filename, "rb") as f:
+            while True:
+                size = f.read(4)
+                if len(size) < 4:
+                    break
+                compressed = f.read(struct.unpack("<I", size)[0])
+                if len(compressed) < struct.unpack("<I", size)[0]:
+                    break  # cut off while writing
+                frames.append(decompressor.decompress(compressed))
+        metadata = json.loads(frames[0])
+        widths = [width for _, width in metadata["columns"]]
+        chunks = []
+        for frame in frames[1:]:
+            data = np.frombuffer(frame, dtype="<f8")
+            n = len(data) // sum(widths)
+            parts = np.split(data, np.cumsum([n * w for w in widths])[:-1])
+            chunks.append(np.column_stack([part.reshape(n, -1) for part in parts]))
+        rows = np.concatenate(chunks) if chunks else np.empty((0, sum(widths)))
+    else:
+        metadata = {}
+        rows = np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2)
+        agent_count = (rows.shape[1] - 1) // 6
+        metadata["columns"] = [["t", 1]] + [[name, 2 * agent_count] for name in COLUMNS[1:]]
+
+    widths = [width for _, width in metadata["columns"]]
+    columns = np.split(rows, np.cumsum(widths)[:-1], axis=1)
+    columns[0] = columns[0][:, 0]
+    return dict(zip(COLUMNS, columns)), metadata
+
+
+class FlightRecorder:
+    """
+    Records the time, positions, control outputs and setpoints of every
+    controller evaluation into preallocated columnar NumPy chunks.
+
+    Full chunks are written to disk by a background thread and then reused, so
+    memory stays bounded and a crash only loses the chunk being filled. If the
+    disk falls behind by more than the spare chunks, rows are dropped and counted.
+
+    The format follows the file extension, see SINKS. metadata is called once
+    the first chunk is written and must return a JSON serializable dict.
+    """
+
+    CHUNK_ROWS = 4096
+    CHUNK_COUNT = 4
+
+    def __init__(self, agents, filename, metadata=dict):
+        extension = os.path.splitext(filename)[1]
+        if extension not in SINKS:
+            raise RuntimeError(f"Unknown flight record format '{extension}', use one of {list(SINKS)}")
+        self.agents = list(agents)
+        self.filename = filename
+        self.metadata = metadata
+        agent_count = len(self.agents)
+
+        # Latest setpoint of each agent (vx1, vy1, vx2, ...), held until the next one
+        self.setpoints = np.zeros(2 * agent_count)
+
+        self.free_chunks = queue.Queue()
+        for _ in range(self.CHUNK_COUNT - 1):
+            self.free_chunks.put(self._new_chunk(agent_count))
+        self.chunk = self._new_chunk(agent_count)
+        self.row = 0
+
+        self.recorded_count = 0
+        self.dropped_count = 0
+
+        self.full_chunks = queue.Queue()
+        self.writer_thread = threading.Thread(
+            target=self._write_chunks, name="FlightRecorder", daemon=True
+        )
+        self.writer_thread.start()
+
+    def _new_chunk(self, agent_count):
+        t = np.empty(self.CHUNK_ROWS)
+        p = np.empty((self.CHUNK_ROWS, 2 * agent_count))
+        u = np.empty((self.CHUNK_ROWS, 2 * agent_count))
+        setpoint = np.empty((self.CHUNK_ROWS, 2 * agent_count))
+        # u arrives as 2 x N, this view of the agent major rows takes it as is
+        u_by_axis = u.reshape(self.CHUNK_ROWS, agent_count, 2).transpose(0, 2, 1)
+        return t, p, u, setpoint, u_by_axis
+
+    def set_setpoint(self, agent_index, vx, vy):
+        self.setpoints[2 * agent_index] = vx
+        self.setpoints[2 * agent_index + 1] = vy
+
+    def record(self, t, positions_flat, u):
+        """Add a row: positions as (x1, y1, x2, ...), u as 2 x N"""
+        if self.chunk is None:
+            # Every chunk is waiting for the disk
+            try:
+                self.chunk = self.free_chunks.get_nowait()
+            except queue.Empty:
+                self.dropped_count += 1
+                return
+        n = self.row
+        chunk_t, chunk_p, _, chunk_setpoint, chunk_u_by_axis = self.chunk
+        chunk_t[n] = t
+        chunk_p[n] = positions_flat
+        chunk_u_by_axis[n] = u
+        chunk_setpoint[n] = self.setpoints
+        self.recorded_count += 1
+
+        if n + 1 < self.CHUNK_ROWS:
+            self.row = n + 1
+            return
+        self.full_chunks.put((self.chunk, self.CHUNK_ROWS))
+        self.row = 0
+        try:
+            self.chunk = self.free_chunks.get_nowait()
+        except queue.Empty:
+            self.chunk = None
+
+    def close(self):
+        """Write out the partial chunk and wait until everything is on disk"""
+        if self.chunk is not None and self.row > 0:
+            self.full_chunks.put((self.chunk, self.row))
+        self.chunk = None
+        self.full_chunks.put(None)
+        self.writer_thread.join()
+        if self.dropped_count > 0:
+            print(f"Warning: Dropped {self.dropped_count} rows, the disk could not keep up")
+
+    def discard(self):
+        """Stop recording and delete whatever was written"""
+        self.close()
+        base = os.path.splitext(self.filename)[0]
+        for filename in (self.filename, base + ".json"):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _open_sink(self):
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        sink = SINKS[os.path.splitext(self.filename)[1]]
+        return sink(self.filename, self.agents, self.metadata())
+
+    def _write_chunks(self):
+        sink = None
+        while True:
+            item = self.full_chunks.get()
+            if item is None:
+                break
+            (t, p, u, setpoint, _), rows = item
+            if sink is None:
+                sink = self._open_sink()
+            sink.write(t[:rows], p[:rows], u[:rows], setpoint[:rows])
+            self.free_chunks.put(item[0])
+        if sink is None:
+            sink = self._open_sink()
+        sink.close()
@@ -1,4 +1,7 @@
+from functools import cached_property
+
 import numpy as np
+import scipy.sparse
 
 
 class Formation2D:
@@ -12,7 +15,9 @@ class Formation2D:
             )
 
         self.N = N
-        self.H = H.astype(int)
+        # H may be dense or scipy.sparse, it is kept in CSR form since most of
+        # it is zeros for large formations. The dense H is built on first use.
+        self.H_sparse = scipy.sparse.csr_matrix(H, dtype=int)
 
         self.p_des = np.zeros([self.N, self.d])
 
@@ -29,6 +34,27 @@ class Formation2D:
         
         self.M = H.shape[0]
 
+    @cached_property
+    def H(self):
+        return self.H_sparse.toarray()
+
+    @property
+    def edges(self):
+        """The (i, j) agent index pairs of the M edges, i has the 1 and j the -1 in H"""
+        coo = self.H_sparse.tocoo()
+        order = np.lexsort((-coo.data, coo.row))
+        return coo.col[order].reshape(-1, 2)
+
+    @classmethod
+    def from_edges(cls, N, edges):
+        """A formation of N agents from a list of (i, j) agent index pairs, one per edge"""
+        edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+        M = len(edges)
+        H = scipy.sparse.csr_matrix(
+            (np.tile([1, -1], M), (np.repeat(np.arange(M), 2), edges.ravel())), shape=(M, N)
+        )
+        return cls(N, H)
+
     def __str__(self):
         return (
             f"Formation2D(N={self.N}, M={self.M}, d={self.d})\n"
@@ -11,11 +11,12 @@ from cflib.crazyflie.log import LogConfig
 
 # --------------- Customary Modules -------------------------------------------
 import quad_global_variables as qgv
+from ControllerProcess import ControllerProcess
+from FlightRecorder import FlightRecorder
 from Formation2D import Formation2D
 
 import threading
 
-import csv
 from datetime import datetime
 
 class FormationController(ABC):
@@ -29,43 +30,218 @@ class FormationController(ABC):
                 "Please initialize the swarm before initializing the controller"
             )
 
-        self.agent_positions_2D = np.zeros((2, len(qgv.AGENTS)))
+        agent_count = len(qgv.AGENTS)
+        self.index_by_agent = {agent: i for i, agent in enumerate(qgv.AGENTS)}
+        # x and y of each agent side by side, agent_positions_2D is a 2 x N view of it
+        self.positions_flat = np.zeros(2 * agent_count)
+        self.agent_positions_2D = self.positions_flat.reshape(agent_count, 2).T
         self.u = np.zeros((2, len(qgv.AGENTS)))
-        self.u_lock = threading.Lock()
+        self.u_sequence = 0  # incremented with every new u, senders wait on u_lock for it
+        self.u_time = None
+        self.u_lock = threading.Condition()
+        # t is the time since the first update, on the mocap clock when samples
+        # carry a Motive timestamp, otherwise on the local monotonic clock
         self.start = None
-        self.p_memo = []
+        self.t = 0.0
+        self.clock_source = None
+
+        # Written to disk while flying, see save_data
+        self.recorder = FlightRecorder(
+            qgv.AGENTS,
+            datetime.now().strftime("./results-data/%Y-%m-%d_%H-%M_flight")
+            + qgv.FLIGHT_RECORD_FORMAT,
+            self.metadata,
+        )
+
+        # Local monotonic time of each agent's last valid position. Agents without
+        # one for STALE_POSITION_TIMEOUT are stale and handled by
+        # STALE_POSITION_POLICY. This is checked on every frame and by the senders,
+        # which also catches the whole stream stopping.
+        if qgv.STALE_POSITION_POLICY not in ("hover", "hold"):
+            raise RuntimeError(
+                f"Unknown stale position policy '{qgv.STALE_POSITION_POLICY}', use 'hover' or 'hold'"
+            )
+        self.last_update = np.full(agent_count, time.monotonic())
+        self.position_age = np.zeros(agent_count)
+        self.stale = np.zeros(agent_count, dtype=bool)
+        self.stale_now = np.zeros(agent_count, dtype=bool)
+        self.holding = np.zeros(agent_count, dtype=bool)
+        self.stale_changed = np.zeros(agent_count, dtype=bool)
+        # 0-d arrays, numpy converts Python floats into temporary ones
+        self.now = np.zeros(())
+        self.stale_timeout = np.array(qgv.STALE_POSITION_TIMEOUT)
+        self.stale_event_counts = np.zeros(agent_count, dtype=int)
+
+        # Set by run_in_process, evaluates the control law in a worker process
+        self.evaluator = None
+
+        # Collect the positions of a frame and run the control law once in end_frame
+        self.frame_synchronous = qgv.FRAME_SYNCHRONOUS_CONTROL
+        self.frame_updated = False
 
     @abstractmethod
     def control_law(self, p: npt.NDArray, t) -> npt.NDArray:
         pass
 
-    def update(self, agent_id, position_2D):
-        """Should update self.u"""
-        if not self.start:
-            self.start = datetime.now()
-        t = (datetime.now() - self.start).total_seconds()
-        # print(agent_id, position_2D)
-        agent_index = qgv.AGENTS.index(agent_id)
+    def update(self, agent_id, position, timestamp=None):
+        """
+        Should update self.u, only x and y of the position are used. timestamp
+        is the Motive time of the frame, all agents of a frame share it.
+        """
+        if timestamp is None:
+            self._clock(time.monotonic(), "local")
+        else:
+            self._clock(timestamp, "mocap")
+        # print(agent_id, position)
+        index = self.index_by_agent[agent_id]
+        self.last_update[index] = time.monotonic()
+        i = 2 * index
 
-        self.agent_positions_2D[:, agent_index] = np.transpose(np.array(position_2D))
-        self.p_memo.append([t] + self.agent_positions_2D.T.flatten().tolist())
-        
+        self.positions_flat[i] = position[0]
+        self.positions_flat[i + 1] = position[1]
+        if self.frame_synchronous:
+            self.frame_updated = True
+            return
+        self._evaluate(self.t)
+
+    def end_frame(self, timestamp=None):
+        """Runs the control law once every agent of a mocap frame has been updated"""
+        if not (self.frame_synchronous and self.frame_updated):
+            return
+        self.frame_updated = False
+        if timestamp is not None:
+            self._clock(timestamp, "mocap")
+        self._evaluate(self.t)
+
+    def _clock(self, now, source):
+        if self.start is None or source != self.clock_source or now - self.start < self.t:
+            # First sample, a switch of clocks or Motive restarted: carry on from t
+            self.start = now - self.t
+            self.clock_source = source
+        self.t = now - self.start
+
+    def _check_freshness(self, now):
+        """Updates stale against the local monotonic time now, call with u_lock held"""
+        self.now[()] = now
+        np.subtract(self.now, self.last_update, out=self.position_age)
+        np.greater(self.position_age, self.stale_timeout, out=self.stale_now)
+        # count_nonzero, unlike any(), does not allocate
+        if np.count_nonzero(np.not_equal(self.stale_now, self.stale, out=self.stale_changed)):
+            for index in np.flatnonzero(self.stale_changed):
+                if self.stale_now[index]:
+                    self.stale_event_counts[index] += 1
+                    print(
+                        f"Warning: No position of agent {qgv.AGENTS[index]} for "
+                        f"{self.position_age[index]:.2f} s, applying '{qgv.STALE_POSITION_POLICY}'"
+                    )
+                else:
+                    print(f"Agent {qgv.AGENTS[index]} position is back")
+            self.stale[:] = self.stale_now
+        return np.count_nonzero(self.stale) > 0
+
+    def _apply_stale_policy(self, u):
+        """Overrides the output of stale agents in u, call with u_lock held"""
+        hovering = self.stale
+        if qgv.STALE_POSITION_POLICY == "hold":
+            # Keep the last output for STALE_HOLD_TIME, then hover
+            np.less_equal(
+                self.position_age, qgv.STALE_POSITION_TIMEOUT + qgv.STALE_HOLD_TIME, out=self.holding
+            )
+            self.holding &= self.stale
+            u[:, self.holding] = self.u[:, self.holding]
+            hovering = self.stale & ~self.holding
+        u[:, hovering] = 0.0
+
+    def _evaluate(self, t):
+        with self.u_lock:
+            self._check_freshness(time.monotonic())
+        if self.evaluator is not None:
+            self.evaluator.submit(t, self.positions_flat)
+            return
+        evaluating = time.perf_counter()
         u = self.control_law(self.agent_positions_2D, t)
         
-        self._set_u(u)
+        self._publish(t, self.positions_flat, u, evaluating)
+
+    def _publish(self, t, positions_flat, u, evaluating):
+        with self.u_lock:
+            # Under the lock, wait_for_u may republish and record from the senders
+            self._set_u(u)
+            self.recorder.record(t, positions_flat, u)
+        if qgv.pipeline_timer is not None:
+            qgv.pipeline_timer.record("control_law", None, self.u_time - evaluating)
+
+    def run_in_process(self):
+        """From now on evaluate control_law in a worker process, see ControllerProcess"""
+        self.evaluator = ControllerProcess(self)
+        self.evaluator.start()
+
+    def stop_controller(self):
+        if self.evaluator is not None:
+            self.evaluator.stop()
+            self.evaluator = None
+
+    def stale_summary(self):
+        return ", ".join(
+            f"agent {agent}: {count}"
+            for agent, count in zip(qgv.AGENTS, self.stale_event_counts)
+            if count > 0
+        )
+
+    def __getstate__(self):
+        # A worker process only needs what control_law uses
+        state = self.__dict__.copy()
+        for name in ("u_lock", "recorder", "evaluator"):
+            state.pop(name, None)
+        return state
     
+    def metadata(self):
+        """Stored with the flight record, extend it with the controller's parameters"""
+        return {
+            "controller": type(self).__name__,
+            "agents": list(qgv.AGENTS),
+            "control_period": qgv.CONTROL_PERIOD,
+            "frame_synchronous": self.frame_synchronous,
+            "fly_height": qgv.FLY_HEIGHT,
+            "max_speed": qgv.MAX_SPEED,
+        }
+
     def save_data(self):
-        filename = datetime.now().strftime("./results-data/%Y-%m-%d_%H-%M_positions.csv")
-        print(f"Saving to {filename}...")
-        with open(filename, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerows(self.p_memo)
+        """Finish writing the flight record, load it with FlightRecorder.load_flight"""
+        print(f"Saving to {self.recorder.filename}...")
+        self.recorder.close()
+
+    def discard_data(self):
+        self.recorder.discard()
 
     def _set_u(self, u):
         with self.u_lock:
+            if np.count_nonzero(self.stale):
+                self._apply_stale_policy(u)
             self.u = u
+            self.u_time = time.perf_counter()  # for the latency until it is sent
+            self.u_sequence += 1
+            self.u_lock.notify_all()
 
     def get_u(self):
         with self.u_lock:
             u = self.u
         return u
+
+    def wait_for_u(self, sequence, timeout):
+        """
+        Wait until a u newer than sequence is published, or timeout seconds
+        have passed. Returns the latest u and its sequence number either way.
+        """
+        with self.u_lock:
+            self.u_lock.wait_for(lambda: self.u_sequence != sequence, timeout)
+            # Without any new frames _evaluate never runs, so check here as well.
+            # Senders may still hold self.u, republish a copy when the policy changes it
+            if self._check_freshness(time.monotonic()):
+                u = self.u.copy()
+                self._apply_stale_policy(u)
+                if not np.array_equal(u, self.u):
+                    self._set_u(u)
+                    self.recorder.record(self.t, self.positions_flat, u)
+            return self.u, self.u_sequence
+
@@ -0,0 +1,77 @@
+# --------------- Python Libraries --------------------------------------------
+import time
+
+
+class PeriodicScheduler:
+    """
+    Runs a loop body at a fixed period against absolute deadlines on
+    time.perf_counter, so work time and oversleep do not add up to drift.
+
+    When a cycle starts a full period or more late, "skip" drops the missed
+    cycles and keeps the original phase, "catch_up" runs them back to back.
+    The lateness of every cycle is recorded as jitter.
+    """
+
+    SPIN = 0.001  # in seconds, busy wait the end of each sleep for precision
+
+    def __init__(self, period, overrun="skip"):
+        if overrun not in ("skip", "catch_up"):
+            raise RuntimeError(f"Unknown overrun policy '{overrun}', use 'skip' or 'catch_up'")
+        self.period = period
+        self.overrun = overrun
+
+        self.cycle_count = 0
+        self.overrun_count = 0  # cycles that started a period or more late
+        self.skipped_count = 0  # cycles dropped by the skip policy
+        self.jitter_sum = 0.0
+        self.jitter_sq_sum = 0.0
+        self.jitter_max = 0.0
+
+    def run(self, duration=None, cycles=None):
+        """Yields the cycle number at each deadline, until duration seconds or cycles have passed"""
+        start = time.perf_counter()
+        slot = 0  # deadlines are start + slot * period, never accumulated
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            if duration is not None and slot * self.period >= duration:
+                # End at start + duration, not early in the last cycle
+                self._sleep_until(start + duration)
+                return
+            deadline = start + slot * self.period
+            now = self._sleep_until(deadline)
+
+            lateness = now - deadline
+            self.cycle_count += 1
+            self.jitter_sum += lateness
+            self.jitter_sq_sum += lateness * lateness
+            self.jitter_max = max(self.jitter_max, lateness)
+            if lateness >= self.period:
+                self.overrun_count += 1
+                if self.overrun == "skip":
+                    missed = int(lateness // self.period)
+                    self.skipped_count += missed
+                    slot += missed
+
+            yield cycle
+            cycle += 1
+            slot += 1
+
+    def _sleep_until(self, deadline):
+        now = time.perf_counter()
+        if deadline - now > self.SPIN:
+            time.sleep(deadline - now - self.SPIN)
+        now = time.perf_counter()
+        while now < deadline:
+            now = time.perf_counter()
+        return now
+
+    def summary(self):
+        if self.cycle_count == 0:
+            return "no cycles"
+        mean = self.jitter_sum / self.cycle_count
+        std = max(self.jitter_sq_sum / self.cycle_count - mean * mean, 0.0) ** 0.5
+        return (
+            f"{self.cycle_count} cycles of {self.period * 1000:.1f} ms, jitter mean "
+            f"{mean * 1000:.3f} ms, std {std * 1000:.3f} ms, max {self.jitter_max * 1000:.3f} ms, "
+            f"{self.overrun_count} overruns, {self.skipped_count} skipped"
+        )
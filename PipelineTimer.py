@@ -0,0 +1,85 @@
+# --------------- Python Libraries --------------------------------------------
+import math
+import threading
+
+
+class LatencyHistogram:
+    """
+    Counts durations in logarithmic bins, 8 per octave from 1 us, so adding a
+    sample is a few arithmetic operations and percentiles are within ~9%.
+    """
+
+    MIN = 1e-6  # in seconds, smaller durations go in the first bin
+    BINS_PER_OCTAVE = 8
+    BIN_COUNT = 8 * 24  # up to ~16 s
+
+    def __init__(self):
+        self.counts = [0] * self.BIN_COUNT
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds > self.MIN:
+            b = int(math.log2(seconds / self.MIN) * self.BINS_PER_OCTAVE)
+            if b >= self.BIN_COUNT:
+                b = self.BIN_COUNT - 1
+        else:
+            b = 0
+        self.counts[b] += 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile, in seconds"""
+        target = q / 100 * self.count
+        seen = 0
+        for b, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                return min(self.MIN * 2 ** ((b + 1) / self.BINS_PER_OCTAVE), self.max)
+        return self.max
+
+
+class PipelineTimer:
+    """
+    Latency histograms per pipeline stage and agent, from the mocap camera to
+    the setpoint leaving for the radio. Agent None is for swarm wide stages.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (stage, agent) -> LatencyHistogram, in first use order
+        self.lock = threading.Lock()  # only taken when a histogram is added
+
+    def record(self, stage, agent, seconds):
+        histogram = self.histograms.get((stage, agent))
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault((stage, agent), LatencyHistogram())
+        histogram.add(seconds)
+
+    def summary(self):
+        lines = [f"{'stage':<16}{'agent':>6}{'count':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for (stage, agent), h in sorted(
+            self.histograms.items(), key=lambda item: STAGE_ORDER.get(item[0][0], len(STAGE_ORDER))
+        ):
+            if h.count == 0:
+                continue
+            lines.append(
+                f"{stage:<16}{'all' if agent is None else agent:>6}{h.count:>9}"
+                f"{h.percentile(50) * 1000:>10.3f}{h.percentile(99) * 1000:>10.3f}{h.max * 1000:>10.3f}"
+            )
+        return "\n".join(lines)
+
+
+# Pipeline order of the stages, for the summary
+STAGES = (
+    "mocap",  # camera mid-exposure until Motive sent the frame
+    "decode",  # frame received until the agent's rigid body is decoded
+    "route",  # forwarding the pose to the drone or its pose transmitter
+    "update",  # FormationController.update
+    "control_law",  # one control law evaluation
+    "u_to_setpoint",  # control output published until the setpoint is sent
+    "send",  # set_2D_velocity
+)
+STAGE_ORDER = {stage: i for i, stage in enumerate(STAGES)}
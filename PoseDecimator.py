@@ -0,0 +1,44 @@
+# --------------- Python Libraries --------------------------------------------
+from math import floor
+
+
+class PoseDecimator:
+    """
+    Decides which mocap frames of one drone's pose stream are forwarded.
+
+    Forwarded frames are picked on an evenly spaced grid of Motive frame
+    numbers, either every Nth frame or as many frames as give the target rate.
+    A frame that never arrives moves the sample to the next frame that does,
+    without shifting the grid, so the spacing stays even on average.
+    """
+
+    def __init__(self, rate=None, every_nth=None, phase=0.0):
+        self.rate = rate  # forwarded poses per second
+        self.every_nth = every_nth  # takes precedence over rate
+        self.phase = phase  # fraction of a step, to stagger drones on a radio
+
+        self.next_frame = None
+        self.forwarded_count = 0
+        self.skipped_count = 0
+
+    def step(self, frame_period):
+        """Frames between forwarded poses, can be fractional"""
+        if self.every_nth:
+            return self.every_nth
+        if self.rate and frame_period:
+            return max(1.0, 1.0 / (self.rate * frame_period))
+        return 1.0
+
+    def accept(self, frame_number, frame_period):
+        """Whether the pose of this frame should be forwarded"""
+        step = self.step(frame_period)
+        if self.next_frame is None or frame_number < self.next_frame - 2 * step:
+            # First pose, or Motive restarted and the frame numbers went back
+            self.next_frame = frame_number + self.phase * step
+        if frame_number < self.next_frame:
+            self.skipped_count += 1
+            return False
+        # Move to the next grid point, past any that fell between frames we got
+        self.next_frame += step * (floor((frame_number - self.next_frame) / step) + 1)
+        self.forwarded_count += 1
+        return True
@@ -0,0 +1,25 @@
+class PosePredictor:
+    """
+    Extrapolates one rigid body's position to when it will reach the drone.
+
+    The velocity is the one the shared SwarmStateEstimator fitted to the
+    agent's recent frames, see SwarmStateEstimator.refresh, so mocap noise
+    stays out of the prediction. Frame times come from the Motive frame
+    timestamps, so network jitter does not show up as velocity.
+    """
+
+    MAX_HORIZON = 0.05  # in seconds, never extrapolate further than this
+
+    def __init__(self, swarm_state, agent_index):
+        self.swarm_state = swarm_state
+        self.agent_index = agent_index
+
+    def predict(self, position, latency):
+        """Where the body will be after latency seconds"""
+        horizon = min(latency, self.MAX_HORIZON)
+        velocity = self.swarm_state.velocity[:, self.agent_index]
+        return (
+            position[0] + velocity[0] * horizon,
+            position[1] + velocity[1] * horizon,
+            position[2] + velocity[2] * horizon,
+        )
@@ -0,0 +1,213 @@
+# --------------- Python Libraries --------------------------------------------
+import struct
+import threading
+
+# --------------- Crazyflie Library -----------------------------------------
+from cflib.crtp import radiodriver
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+from cflib.crtp.radiodriver import RadioDriver, RadioManager
+from cflib.drivers.crazyradio import Crazyradio
+
+
+def radio_of(uri):
+    """The physical radio part of a crazyflie URI, e.g. 'radio://0'"""
+    return "/".join(uri.split("/")[:3])
+
+
+class PoseTransmitter:
+    """
+    Forwards mocap poses to the crazyflies on one radio from a dedicated thread.
+
+    The NatNet data thread only publishes the latest pose of each drone, which
+    overwrites any pose of that drone not yet sent. The worker sends whatever is
+    pending in round-robin order, so a slow radio delays only its own drones.
+    """
+
+    def __init__(self, radio, send):
+        self.radio = radio
+        self.send = send  # send(cf, position, rotation)
+
+        self.cfs = []  # round-robin order
+        self.pending = {}  # cf -> (position, rotation), latest only
+        self.next_start = 0
+        self.condition = threading.Condition()
+
+        self.sent_count = 0
+        self.overwritten_count = 0  # poses replaced before they could be sent
+        self.failed_count = 0  # poses whose send raised
+        self.failing = set()  # what last failed to send, reported once until it recovers
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(
+            target=self._run, name=f"PoseTransmitter {self.radio}", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def publish(self, cf, position, rotation):
+        """Hand over the latest pose of a drone, returns immediately"""
+        with self.condition:
+            if cf in self.pending:
+                self.overwritten_count += 1
+            elif cf not in self.cfs:
+                self.cfs.append(cf)
+            self.pending[cf] = (position, rotation)
+            self.condition.notify()
+
+    def end_frame(self):
+        """Called once every rigid body of a mocap frame has been published"""
+        pass
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                pending = self.pending
+                self.pending = {}
+                cfs = self.cfs
+                start = self.next_start % len(cfs)
+                self.next_start = start + 1
+
+            # Start with a different drone each pass so none is always sent last
+            self._send_pending([cf for cf in cfs[start:] + cfs[:start] if cf in pending], pending)
+
+    def _send_pending(self, cfs, pending):
+        for cf in cfs:
+            position, rotation = pending[cf]
+            try:
+                self.send(cf, position, rotation)
+            except Exception as e:
+                # Keep going, the other drones still need their poses
+                self._failed(cf.link_uri, 1, e)
+                continue
+            self._sent(cf.link_uri, 1)
+
+    def _sent(self, target, count):
+        self.sent_count += count
+        if target in self.failing:
+            self.failing.discard(target)
+            print(f"Sending poses to {target} works again")
+
+    def _failed(self, target, count, error):
+        self.failed_count += count
+        if target not in self.failing:
+            self.failing.add(target)
+            print(f"ERROR: Sending poses to {target} failed: {error!r}")
+
+
+class PackedPoseTransmitter(PoseTransmitter):
+    """
+    A PoseTransmitter that broadcasts the positions of all drones on its radio
+    together, once per mocap frame, using the CRTP packed external position
+    packet. Each packet carries up to 4 drones, every Crazyflie picks out the
+    entry whose id matches the last byte of its radio address.
+
+    Poses are only sent when end_frame() is called, after every rigid body of
+    the frame has been published. Rotations are not sent.
+
+    No Crazyflie acknowledges a broadcast. With dedicated set, the broadcast
+    URI names a Crazyradio used for nothing else, and packets go out with ACKs
+    off. Otherwise the dongle is shared with the links, which cflib only lets
+    us send to with ACKs on. Retries are then turned off for each frame's
+    packets, and that applies to the whole dongle: other links on it lose
+    their retries while a broadcast is sent.
+    """
+
+    EXT_POSITION_PACKED_CH = 2
+    ITEM = struct.Struct("<Bhhh")  # id, x, y, z in mm
+    MAX_ITEMS = 4  # per 30 byte CRTP payload
+
+    def __init__(self, radio, send, broadcast_uri, dedicated=False):
+        super().__init__(radio, send)
+        self.broadcast_uri = broadcast_uri
+        self.dedicated = dedicated
+        self.ids = {}  # cf -> id in packed packets
+        self.frame = {}  # poses published since the last end_frame()
+        self.packet_count = 0
+        self.radio_instance = None
+
+    def start(self):
+        devid, channel, datarate, address, _ = RadioDriver.parse_uri(self.broadcast_uri)
+        if self.dedicated:
+            self.radio_instance = Crazyradio(devid=devid)
+            self.radio_instance.set_ack_enable(False)
+        else:
+            # Share the dongle with the crazyflie links, but address every drone
+            self.radio_instance = RadioManager.open(devid)
+        self.radio_instance.set_channel(channel)
+        self.radio_instance.set_data_rate(datarate)
+        self.radio_instance.set_address(address)
+        super().start()
+
+    def stop(self):
+        super().stop()
+        if self.radio_instance is not None:
+            self.radio_instance.close()
+            self.radio_instance = None
+
+    def publish(self, cf, position, rotation):
+        """Store the latest pose of a drone, it is sent on the next end_frame()"""
+        with self.condition:
+            if cf not in self.cfs:
+                self.cfs.append(cf)
+                self.ids[cf] = int(cf.link_uri[-2:], 16)
+            self.frame[cf] = (position, rotation)
+
+    def end_frame(self):
+        # Hand the whole frame to the worker at once so it is never split
+        with self.condition:
+            if not self.frame:
+                return
+            for cf in self.frame:
+                if cf in self.pending:
+                    self.overwritten_count += 1
+            self.pending.update(self.frame)
+            self.frame = {}
+            self.condition.notify()
+
+    def _send_pending(self, cfs, pending):
+        if self.dedicated:
+            self._send_packets(cfs, pending)
+            return
+        # Without retries the shared radio gives up after the first ACK timeout
+        self.radio_instance.set_arc(0)
+        try:
+            self._send_packets(cfs, pending)
+        finally:
+            self.radio_instance.set_arc(radiodriver._nr_of_arc_retries)
+
+    def _send_packets(self, cfs, pending):
+        for i in range(0, len(cfs), self.MAX_ITEMS):
+            group = cfs[i : i + self.MAX_ITEMS]
+            try:
+                pk = CRTPPacket()
+                pk.port = CRTPPort.LOCALIZATION
+                pk.channel = self.EXT_POSITION_PACKED_CH
+                pk.data = b"".join(
+                    self.ITEM.pack(
+                        self.ids[cf],
+                        round(pending[cf][0][0] * 1000),
+                        round(pending[cf][0][1] * 1000),
+                        round(pending[cf][0][2] * 1000),
+                    )
+                    for cf in group
+                )
+                self.radio_instance.send_packet((pk.header,) + tuple(pk.data))
+            except Exception as e:
+                self._failed(self.broadcast_uri, len(group), e)
+                continue
+            self.packet_count += 1
+            self._sent(self.broadcast_uri, len(group))
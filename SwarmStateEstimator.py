@@ -0,0 +1,89 @@
+# --------------- Python Libraries --------------------------------------------
+import threading
+
+import numpy as np
+import numpy.typing as npt
+
+
+class SwarmStateEstimator:
+    """
+    Keeps the last few timestamped mocap positions of every agent in a ring
+    buffer, and estimates the velocity and acceleration of the whole swarm at
+    once by fitting a quadratic to each agent's window by least squares.
+
+    refresh() is called once per frame and shares the latest estimate through
+    fitted, velocity and acceleration.
+    """
+
+    def __init__(self, agent_count, window=8, dims=3):
+        self.window = window
+        self.times = np.full((window, agent_count), np.nan)
+        self.positions = np.zeros((window, dims, agent_count))
+        self.heads = np.zeros(agent_count, dtype=int)  # next slot of each agent
+        self.lock = threading.Lock()
+
+        self.fitted = np.zeros((dims, agent_count))
+        self.velocity = np.zeros((dims, agent_count))
+        self.acceleration = np.zeros((dims, agent_count))
+
+    def update(self, agent_index, position, t):
+        """Add the position of one agent at time t (in seconds)"""
+        with self.lock:
+            head = self.heads[agent_index]
+            if self.times[head - 1, agent_index] >= t:
+                # Time went back, Motive restarted: start the window over
+                self.times[:, agent_index] = np.nan
+            self.times[head, agent_index] = t
+            self.positions[head, :, agent_index] = position
+            self.heads[agent_index] = (head + 1) % self.window
+
+    def refresh(self):
+        """Estimate for the latest samples, readers pick up the new arrays"""
+        self.fitted, self.velocity, self.acceleration = self.estimate()
+
+    def estimate(self) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+        """
+        Filtered position, velocity and acceleration of every agent at its
+        latest sample, each dims x agents. Agents with fewer than 3 samples
+        get a finite difference velocity, or zero, and zero acceleration.
+        """
+        with self.lock:
+            times = self.times.copy()
+            positions = self.positions.copy()
+            latest = (self.heads - 1) % self.window
+
+        agents = np.arange(times.shape[1])
+        valid = ~np.isnan(times)
+        count = valid.sum(axis=0)
+
+        # Scale the time offsets to [-1, 0] per agent to keep the fit well conditioned
+        tau = np.where(valid, times - times[latest, agents], 0.0)
+        span = -tau.min(axis=0)
+        span[span == 0] = 1.0
+        s = tau / span
+
+        # Normal equations of p(s) = a + b s + c s^2 for every agent at once
+        basis = s[..., None] ** np.arange(3) * valid[..., None]  # window x agents x 3
+        gram = np.einsum("wni,wnj->nij", basis, basis)
+        moments = np.einsum("wni,wdn->nid", basis, positions)
+
+        fitted = positions[latest, :, agents].T
+        velocity = np.zeros_like(fitted)
+        acceleration = np.zeros_like(fitted)
+
+        quadratic = count >= 3
+        if quadratic.any():
+            coeffs = np.linalg.solve(gram[quadratic], moments[quadratic])  # n x 3 x dims
+            fitted[:, quadratic] = coeffs[:, 0].T
+            velocity[:, quadratic] = coeffs[:, 1].T / span[quadratic]
+            acceleration[:, quadratic] = 2 * coeffs[:, 2].T / span[quadratic] ** 2
+
+        linear = count == 2
+        if linear.any():
+            previous = (latest[linear] - 1) % self.window
+            velocity[:, linear] = (
+                positions[latest[linear], :, agents[linear]]
+                - positions[previous, :, agents[linear]]
+            ).T / span[linear]
+
+        return fitted, velocity, acceleration
@@ -0,0 +1,78 @@
+"""
+Microbenchmark of the FormationController update hot path. Run it from the
+repository root with: python -m benchmarks.controller_update
+
+Times a full mocap frame (one update per agent and end_frame) and measures
+with tracemalloc what the frames allocate. The flight record goes to a
+temporary directory and is discarded.
+"""
+
+# --------------- Python Libraries --------------------------------------------
+import os
+import tempfile
+import timeit
+import tracemalloc
+
+# --------------- Customary Modules -------------------------------------------
+import quad_global_variables as qgv
+from FlightRecorder import FlightRecorder
+from FormationController import FormationController
+
+
+class NullController(FormationController):
+    def control_law(self, p, t):
+        return self.u
+
+
+def benchmark(directory):
+    agent_count = len(qgv.AGENTS)
+    positions = [(0.1 * i, 0.2 * i, 0.5) for i in range(agent_count)]
+
+    controller = NullController(swarm=object())  # no links are needed
+    controller.discard_data()
+    controller.recorder = FlightRecorder(
+        qgv.AGENTS, os.path.join(directory, "benchmark.npy"), controller.metadata
+    )
+
+    def frame():
+        for agent_id, position in zip(qgv.AGENTS, positions):
+            controller.update(agent_id, position)
+        controller.end_frame()
+
+    # Everything stays within one chunk, so the recorder never writes to disk
+    frames = FlightRecorder.CHUNK_ROWS // 4
+    timed_frames = frames // 10
+
+    for _ in range(timed_frames):  # warm up
+        frame()
+
+    seconds = min(timeit.repeat(frame, number=timed_frames, repeat=5)) / timed_frames
+    print(
+        "%d agents: %.2f us per frame, %.2f us per update"
+        % (agent_count, seconds * 1e6, seconds * 1e6 / agent_count)
+    )
+
+    tracemalloc.start()
+    frame()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(frames):
+        frame()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "%d frames: %d bytes retained in total, %d bytes peak above the start"
+        % (frames, after - before, peak - before)
+    )
+
+    controller.recorder.discard()
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # the controller's default recorder is created here
+        try:
+            benchmark(directory)
+        finally:
+            os.chdir(cwd)
@@ -64,22 +64,18 @@ def run_swarm():
         qu.swarm_initializer()
         assert qgv.swarm != None
 
-        agent_id_by_uri = {uri: [qgv.AGENTS[i]] for i, uri in enumerate(qgv.uris)}
-        print(agent_id_by_uri)
-
         formation = get_formation(len(qgv.AGENTS))
 
         if formation == None:
             raise RuntimeError("Could not get Formation")
 
         qgv.formation_controller = FixedTimeController(formation)
+        if qgv.CONTROLLER_IN_PROCESS:
+            qgv.formation_controller.run_in_process()
         time.sleep(1)
         # qgv.swarm.parallel_safe(qu.light_check)
         # qgv.swarm.parallel_safe(qp.hover_sequence)
-        qgv.swarm.parallel_safe(
-            lambda scf, agent_index: qp.formation_control_sequence(scf, agent_index),
-            args_dict=agent_id_by_uri,
-        )
+        qp.swarm_formation_control_sequence(qgv.swarm)
         
         user_input = ""
         while (user_input != "y" and user_input != "n"):
@@ -87,6 +83,8 @@ def run_swarm():
         
         if (user_input == "y"):
             qgv.formation_controller.save_data()
+        else:
+            qgv.formation_controller.discard_data()
             
         qu.quad_shutDown()
     except Exception as e:
@@ -418,6 +418,17 @@ class DataDescriptions():
         self.device_list=[]
         self.camera_list=[]
 
+        # Indexes for O(1) lookup, kept current by the add functions.
+        # Names are stored as str, if two entries share a key the last one added wins.
+        self.rigid_body_by_name={}
+        self.rigid_body_by_id={}
+        self.skeleton_by_name={}
+        self.skeleton_by_id={}
+        self.force_plate_by_serial_number={}
+        self.force_plate_by_id={}
+        self.device_by_name={}
+        self.device_by_id={}
+
     def generate_order_name(self):
         """Generate the name for the order list based on the current length of the list"""
         # should be a one up counter instead of based on length of data_order_dict
@@ -445,6 +456,11 @@ class DataDescriptions():
         self.data_order_dict[order_name]=("rigid_body_list", pos)
         self.rigid_body_list.append(copy.deepcopy(new_rigid_body))
 
+        # index entry
+        rigid_body = self.rigid_body_list[pos]
+        self.rigid_body_by_name[get_as_string(rigid_body.sz_name)]=rigid_body
+        self.rigid_body_by_id[rigid_body.id_num]=rigid_body
+
 
     # Add a skeleton
     def add_skeleton(self, new_skeleton):
@@ -456,6 +472,11 @@ class DataDescriptions():
         self.data_order_dict[order_name]=("skeleton_list", pos)
         self.skeleton_list.append(copy.deepcopy(new_skeleton))
 
+        # index entry
+        skeleton = self.skeleton_list[pos]
+        self.skeleton_by_name[get_as_string(skeleton.name)]=skeleton
+        self.skeleton_by_id[skeleton.id_num]=skeleton
+
 
     # Add a force plate
     def add_force_plate(self, new_force_plate):
@@ -467,6 +488,11 @@ class DataDescriptions():
         self.data_order_dict[order_name]=("force_plate_list", pos)
         self.force_plate_list.append(copy.deepcopy(new_force_plate))
 
+        # index entry
+        force_plate = self.force_plate_list[pos]
+        self.force_plate_by_serial_number[get_as_string(force_plate.serial_number)]=force_plate
+        self.force_plate_by_id[force_plate.id_num]=force_plate
+
 
     def add_device(self, newdevice):
         """ add_device - Add a device"""
@@ -477,6 +503,11 @@ class DataDescriptions():
         self.data_order_dict[order_name]=("device_list", pos)
         self.device_list.append(copy.deepcopy(newdevice))
 
+        # index entry
+        device = self.device_list[pos]
+        self.device_by_name[get_as_string(device.name)]=device
+        self.device_by_id[device.id_num]=device
+
 
     def add_camera(self, newcamera):
         """ Add a new camera """
@@ -507,6 +538,38 @@ class DataDescriptions():
         else:
             print("ERROR: Type %s unknown"%str(data_type))
 
+    def get_rigid_body_by_name(self, name):
+        """Rigid body description with the given name, or None"""
+        return self.rigid_body_by_name.get(get_as_string(name))
+
+    def get_rigid_body_by_id(self, new_id):
+        """Rigid body description with the given streaming id, or None"""
+        return self.rigid_body_by_id.get(new_id)
+
+    def get_skeleton_by_name(self, name):
+        """Skeleton description with the given name, or None"""
+        return self.skeleton_by_name.get(get_as_string(name))
+
+    def get_skeleton_by_id(self, new_id):
+        """Skeleton description with the given id, or None"""
+        return self.skeleton_by_id.get(new_id)
+
+    def get_force_plate_by_serial_number(self, serial_number):
+        """Force plate description with the given serial number, or None"""
+        return self.force_plate_by_serial_number.get(get_as_string(serial_number))
+
+    def get_force_plate_by_id(self, new_id):
+        """Force plate description with the given id, or None"""
+        return self.force_plate_by_id.get(new_id)
+
+    def get_device_by_name(self, name):
+        """Device description with the given name, or None"""
+        return self.device_by_name.get(get_as_string(name))
+
+    def get_device_by_id(self, new_id):
+        """Device description with the given id, or None"""
+        return self.device_by_id.get(new_id)
+
     def get_object_from_list(self, list_name, pos_num):
         """Determine list name and position of the object"""
         ret_value = None
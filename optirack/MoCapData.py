@@ -107,6 +107,20 @@ def get_as_string(input_str):
         return input_str
 
 
+# Frame pooling helpers
+# In frame pool mode the containers below are reset() and refilled in place
+# instead of being reallocated every frame. Elements dropped by reset() are
+# kept on a spare list and handed out again by the next_*() methods.
+def recycle_list(active_list, spare_list):
+    spare_list.extend(active_list)
+    active_list.clear()
+
+def reuse_from(spare_list, factory):
+    if spare_list:
+        return spare_list.pop()
+    return factory()
+
+
 #MoCap Frame Classes
 class FramePrefixData:
     def __init__(self, frame_number):
@@ -122,6 +136,10 @@ class MarkerData:
         self.model_name=""
         self.marker_pos_list=[]
 
+    def reset(self):
+        self.model_name=""
+        self.marker_pos_list.clear()
+
     def set_model_name(self, model_name):
         self.model_name = model_name
 
@@ -150,13 +168,32 @@ class MarkerData:
 class MarkerSetData:
     def __init__(self):
         self.marker_data_list=[]
+        self.spare_marker_data_list=[]
         self.unlabeled_markers=MarkerData()
         self.unlabeled_markers.set_model_name("")
 
+    def reset(self):
+        recycle_list(self.marker_data_list, self.spare_marker_data_list)
+        self.unlabeled_markers.reset()
+
     def add_marker_data(self, marker_data):
         self.marker_data_list.append(copy.deepcopy(marker_data))
         return len(self.marker_data_list)
 
+    def next_marker_data(self):
+        """Pooled alternative to add_marker_data, reuses a MarkerData without copying"""
+        marker_data = reuse_from(self.spare_marker_data_list, MarkerData)
+        marker_data.reset()
+        self.marker_data_list.append(marker_data)
+        return marker_data
+
+    def copy(self):
+        marker_set_data = MarkerSetData()
+        for marker_data in self.marker_data_list:
+            marker_set_data.add_marker_data(marker_data)
+        marker_set_data.unlabeled_markers = copy.deepcopy(self.unlabeled_markers)
+        return marker_set_data
+
     def add_unlabeled_marker(self, pos):
         self.unlabeled_markers.add_pos(pos)
 
@@ -209,6 +246,14 @@ class RigidBody:
         self.tracking_valid = False
         self.error = 0.0
 
+    def reset(self, new_id, pos, rot):
+        self.id_num = new_id
+        self.pos=pos
+        self.rot=rot
+        self.rb_marker_list.clear()
+        self.tracking_valid = False
+        self.error = 0.0
+
     def add_rigid_body_marker(self, rigid_body_marker):
         self.rb_marker_list.append(copy.deepcopy(rigid_body_marker))
         return len(self.rb_marker_list)
@@ -251,12 +296,28 @@ class RigidBody:
 class RigidBodyData:
     def __init__(self):
         self.rigid_body_list=[]
+        self.spare_rigid_body_list=[]
 
+    def reset(self):
+        recycle_list(self.rigid_body_list, self.spare_rigid_body_list)
 
     def add_rigid_body(self, rigid_body):
         self.rigid_body_list.append(copy.deepcopy(rigid_body))
         return len(self.rigid_body_list)
 
+    def next_rigid_body(self, new_id, pos, rot):
+        """Pooled alternative to add_rigid_body, reuses a RigidBody without copying"""
+        rigid_body = reuse_from(self.spare_rigid_body_list, lambda: RigidBody(new_id, pos, rot))
+        rigid_body.reset(new_id, pos, rot)
+        self.rigid_body_list.append(rigid_body)
+        return rigid_body
+
+    def copy(self):
+        rigid_body_data = RigidBodyData()
+        for rigid_body in self.rigid_body_list:
+            rigid_body_data.add_rigid_body(rigid_body)
+        return rigid_body_data
+
 
     def get_rigid_body_count(self):
         return len(self.rigid_body_list)
@@ -276,6 +337,10 @@ class Skeleton:
         self.id_num=new_id
         self.rigid_body_list=[]
 
+    def reset(self, new_id):
+        self.id_num=new_id
+        self.rigid_body_list.clear()
+
 
     def add_rigid_body(self, rigid_body):
         self.rigid_body_list.append(copy.deepcopy(rigid_body))
@@ -298,11 +363,27 @@ class Skeleton:
 class SkeletonData:
     def __init__(self):
         self.skeleton_list=[]
+        self.spare_skeleton_list=[]
 
+    def reset(self):
+        recycle_list(self.skeleton_list, self.spare_skeleton_list)
 
     def add_skeleton(self, new_skeleton):
         self.skeleton_list.append(copy.deepcopy(new_skeleton))
 
+    def next_skeleton(self, new_id):
+        """Pooled alternative to add_skeleton, reuses a Skeleton without copying"""
+        skeleton = reuse_from(self.spare_skeleton_list, Skeleton)
+        skeleton.reset(new_id)
+        self.skeleton_list.append(skeleton)
+        return skeleton
+
+    def copy(self):
+        skeleton_data = SkeletonData()
+        for skeleton in self.skeleton_list:
+            skeleton_data.add_skeleton(skeleton)
+        return skeleton_data
+
 
     def get_skeleton_count(self):
         return len(self.skeleton_list)
@@ -322,6 +403,9 @@ class SkeletonData:
 
 class LabeledMarker:
     def __init__(self, new_id, pos, size=0.0, param = 0, residual=0.0):
+        self.reset(new_id, pos, size, param, residual)
+
+    def reset(self, new_id, pos, size=0.0, param = 0, residual=0.0):
         self.id_num=new_id
         self.pos = pos
         self.size = size
@@ -330,7 +414,6 @@ class LabeledMarker:
         if str(type(size)) == "<class 'tuple'>":
             self.size=size[0]
 
-
     def __decode_marker_id(self):
         model_id = self.id_num >> 16
         marker_id = self.id_num & 0x0000ffff
@@ -362,11 +445,29 @@ class LabeledMarker:
 class LabeledMarkerData:
     def __init__(self):
         self.labeled_marker_list=[]
+        self.spare_labeled_marker_list=[]
+
+    def reset(self):
+        recycle_list(self.labeled_marker_list, self.spare_labeled_marker_list)
 
     def add_labeled_marker(self, labeled_marker):
         self.labeled_marker_list.append(copy.deepcopy(labeled_marker))
         return len(self.labeled_marker_list)
 
+    def next_labeled_marker(self, new_id, pos, size=0.0, param = 0, residual=0.0):
+        """Pooled alternative to add_labeled_marker, reuses a LabeledMarker without copying"""
+        labeled_marker = reuse_from(self.spare_labeled_marker_list,
+                                    lambda: LabeledMarker(new_id, pos))
+        labeled_marker.reset(new_id, pos, size, param, residual)
+        self.labeled_marker_list.append(labeled_marker)
+        return labeled_marker
+
+    def copy(self):
+        labeled_marker_data = LabeledMarkerData()
+        for labeled_marker in self.labeled_marker_list:
+            labeled_marker_data.add_labeled_marker(labeled_marker)
+        return labeled_marker_data
+
     def get_labeled_marker_count(self):
         return len(self.labeled_marker_list)
 
@@ -417,6 +518,10 @@ class ForcePlate:
         self.id_num = new_id
         self.channel_data_list=[]
 
+    def reset(self, new_id):
+        self.id_num = new_id
+        self.channel_data_list.clear()
+
     def add_channel_data(self, channel_data):
         self.channel_data_list.append(copy.deepcopy(channel_data))
         return len(self.channel_data_list)
@@ -435,11 +540,28 @@ class ForcePlate:
 class ForcePlateData:
     def __init__(self):
         self.force_plate_list=[]
+        self.spare_force_plate_list=[]
+
+    def reset(self):
+        recycle_list(self.force_plate_list, self.spare_force_plate_list)
 
     def add_force_plate(self, force_plate):
         self.force_plate_list.append(copy.deepcopy(force_plate))
         return len(self.force_plate_list)
 
+    def next_force_plate(self, new_id):
+        """Pooled alternative to add_force_plate, reuses a ForcePlate without copying"""
+        force_plate = reuse_from(self.spare_force_plate_list, ForcePlate)
+        force_plate.reset(new_id)
+        self.force_plate_list.append(force_plate)
+        return force_plate
+
+    def copy(self):
+        force_plate_data = ForcePlateData()
+        for force_plate in self.force_plate_list:
+            force_plate_data.add_force_plate(force_plate)
+        return force_plate_data
+
 
     def get_force_plate_count(self):
         return len(self.force_plate_list)
@@ -493,6 +615,10 @@ class Device:
         self.id_num=new_id
         self.channel_data_list = []
 
+    def reset(self, new_id):
+        self.id_num=new_id
+        self.channel_data_list.clear()
+
     def add_channel_data(self, channel_data):
         self.channel_data_list.append(copy.deepcopy(channel_data))
         return len(self.channel_data_list)
@@ -513,11 +639,28 @@ class Device:
 class DeviceData:
     def __init__(self):
         self.device_list=[]
+        self.spare_device_list=[]
+
+    def reset(self):
+        recycle_list(self.device_list, self.spare_device_list)
 
     def add_device(self, device):
         self.device_list.append(copy.deepcopy(device))
         return len(self.device_list)
 
+    def next_device(self, new_id):
+        """Pooled alternative to add_device, reuses a Device without copying"""
+        device = reuse_from(self.spare_device_list, lambda: Device(new_id))
+        device.reset(new_id)
+        self.device_list.append(device)
+        return device
+
+    def copy(self):
+        device_data = DeviceData()
+        for device in self.device_list:
+            device_data.add_device(device)
+        return device_data
+
 
     def get_device_count(self):
         return len(self.device_list)
@@ -536,6 +679,9 @@ class DeviceData:
 
 class FrameSuffixData:
     def __init__(self):
+        self.reset()
+
+    def reset(self):
         self.timecode=-1
         self.timecode_sub=-1
         self.timestamp = -1
@@ -598,6 +744,56 @@ class MoCapData:
     def set_suffix_data(self, new_suffix_data):
         self.suffix_data = new_suffix_data
 
+    def reset(self):
+        """Clear every part of the frame so it can be refilled in place"""
+        if self.prefix_data is None:
+            self.prefix_data = FramePrefixData(0)
+        if self.marker_set_data is None:
+            self.marker_set_data = MarkerSetData()
+        if self.rigid_body_data is None:
+            self.rigid_body_data = RigidBodyData()
+        if self.skeleton_data is None:
+            self.skeleton_data = SkeletonData()
+        if self.labeled_marker_data is None:
+            self.labeled_marker_data = LabeledMarkerData()
+        if self.force_plate_data is None:
+            self.force_plate_data = ForcePlateData()
+        if self.device_data is None:
+            self.device_data = DeviceData()
+        if self.suffix_data is None:
+            self.suffix_data = FrameSuffixData()
+
+        self.prefix_data.frame_number = 0
+        self.marker_set_data.reset()
+        self.rigid_body_data.reset()
+        self.skeleton_data.reset()
+        self.labeled_marker_data.reset()
+        self.force_plate_data.reset()
+        self.device_data.reset()
+        self.suffix_data.reset()
+
+    def copy(self):
+        """Independent copy of the frame, for listeners that keep a pooled frame
+        (or any part of it) past their callback"""
+        mocap_data = MoCapData()
+        if self.prefix_data is not None:
+            mocap_data.set_prefix_data(copy.copy(self.prefix_data))
+        if self.marker_set_data is not None:
+            mocap_data.set_marker_set_data(self.marker_set_data.copy())
+        if self.rigid_body_data is not None:
+            mocap_data.set_rigid_body_data(self.rigid_body_data.copy())
+        if self.skeleton_data is not None:
+            mocap_data.set_skeleton_data(self.skeleton_data.copy())
+        if self.labeled_marker_data is not None:
+            mocap_data.set_labeled_marker_data(self.labeled_marker_data.copy())
+        if self.force_plate_data is not None:
+            mocap_data.set_force_plate_data(self.force_plate_data.copy())
+        if self.device_data is not None:
+            mocap_data.set_device_data(self.device_data.copy())
+        if self.suffix_data is not None:
+            mocap_data.set_suffix_data(copy.copy(self.suffix_data))
+        return mocap_data
+
     def get_as_string(self, tab_str = "  ", level = 0):
         out_tab_str = get_tab_str(tab_str, level)
 
@@ -649,6 +845,26 @@ class MoCapData:
 
 
 
+class MoCapDataPool:
+    """Ring of reusable MoCapData frames used by NatNetClient in frame pool mode.
+
+    acquire() hands out the least recently used frame, reset and ready to be
+    overwritten in place. A frame is only valid until pool_size further frames
+    have been acquired, so listeners must copy() anything they retain.
+    """
+    def __init__(self, pool_size=2):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.frame_list = [MoCapData() for _ in range(pool_size)]
+        self.next_frame = 0
+
+    def acquire(self):
+        mocap_data = self.frame_list[self.next_frame]
+        self.next_frame = (self.next_frame + 1) % len(self.frame_list)
+        mocap_data.reset()
+        return mocap_data
+
+
 # test program
 
 def generate_prefix_data(frame_num = 0):
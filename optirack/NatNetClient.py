@@ -16,7 +16,9 @@
 
 import socket
 import struct
-from threading import Thread
+from threading import Thread, Lock
+from collections import deque
+import concurrent.futures
 import copy
 import time
 import optirack.DataDescriptions as DataDescriptions
@@ -87,6 +89,24 @@ class NatNetClient:
         self.rigid_body_listener = None
         self.new_frame_listener = None
 
+        # Set this to a callback method of your choice to receive the full MoCapData at each frame.
+        # In frame pool mode the frame is recycled after the callback returns,
+        # call mocap_data.copy() on anything you want to keep.
+        self.mocap_data_listener = None
+
+        # Set this to a callback method of your choice to receive the DataDescriptions
+        # each time the server sends its model definitions.
+        self.data_descriptions_listener = None
+
+        # Latest model definitions received from the server
+        self.data_descriptions = None
+        self.__model_def_request_time = 0.0
+
+        # Reuse a small ring of frame containers instead of allocating them every frame
+        self.use_frame_pool = False
+        self.frame_pool_size = 2
+        self.__frame_pool = None
+
         # Set Application Name
         self.__application_name = "Not Set"
 
@@ -99,6 +119,10 @@ class NatNetClient:
         # server stream version. This will be updated to the actual version the server is using during initialization.
         self.__server_version = [0, 0, 0, 0]
 
+        # Ticks per second of the Motive high resolution clock (NatNet 3.0 and later),
+        # used to turn the frame suffix timestamps into seconds.
+        self.high_res_clock_frequency = None
+
         # Lock values once run is called
         self.__is_locked = False
 
@@ -112,6 +136,50 @@ class NatNetClient:
 
         self.stop_threads = False
 
+        # Stream supervision: when no data has arrived for stream_timeout seconds the
+        # sockets and threads are recreated and the client reconnects to the server.
+        self.auto_reconnect = True
+        self.stream_timeout = 1.0
+        self.supervisor_thread = None
+        self.stop_supervisor = False
+        self.__last_data_time = 0.0
+        self.__stream_start_time = 0.0
+
+        # Futures of requests still waiting for their reply, oldest first.
+        # NatNet replies carry no request id, the server answers requests in order.
+        self.__pending_replies = deque()
+        self.__pending_replies_lock = Lock()
+        self.__server_info_reply = None
+
+        # Frames received and valid frames per rigid body id, for wait_until_streaming
+        self.__frame_count = 0
+        self.__valid_frame_counts = {}
+
+        # Number of the frame being unpacked, set before any listener is called.
+        # frame_period is the time in seconds between consecutive frame numbers,
+        # measured from the Motive timestamps of the last two complete frames.
+        self.frame_number = None
+        self.frame_period = None
+        # Motive timestamp (seconds) of the frame being unpacked. Until the frame
+        # suffix is read it is predicted from the frame number, so listeners called
+        # for each rigid body see the same time as the new frame listener.
+        self.frame_timestamp = None
+        # time.perf_counter() when the last data packet arrived, for latency measurements
+        self.receive_time = None
+        # Seconds from mid-exposure of the last complete frame until Motive sent it,
+        # None until known
+        self.frame_latency = None
+        self.__last_frame_number = None
+        self.__last_frame_timestamp = None
+
+        # Recovery statistics, last_recovery_duration is in seconds
+        self.recovery_count = 0
+        self.last_recovery_duration = None
+
+        # Set this to a callback method of your choice to be told how long (in seconds)
+        # it took to get data flowing again after the stream was lost.
+        self.stream_recovered_listener = None
+
     # Client/server message ids
     NAT_CONNECT = 0
     NAT_SERVERINFO = 1
@@ -127,6 +195,28 @@ class NatNetClient:
     NAT_UNRECOGNIZED_REQUEST = 100
     NAT_UNDEFINED = 999999.9999
 
+    # Minimum time between model definition requests triggered by scene changes
+    MODEL_DEF_REFRESH_INTERVAL = 1.0
+
+    # Replies each request type is answered with
+    REPLY_IDS = {
+        NAT_CONNECT: (NAT_SERVERINFO,),
+        NAT_REQUEST: (NAT_RESPONSE, NAT_UNRECOGNIZED_REQUEST),
+        NAT_REQUEST_MODELDEF: (NAT_MODELDEF, NAT_UNRECOGNIZED_REQUEST),
+    }
+
+    # Default time to wait for a reply to a request
+    COMMAND_TIMEOUT = 1.0
+
+    # Share of the expected rate a rigid body must reach to count as streaming
+    MIN_STREAMING_FRACTION = 0.9
+
+    # Blocking reads on the data socket wake up this often to check for stop requests
+    DATA_SOCKET_TIMEOUT = 0.2
+
+    # How often the supervisor checks the stream
+    SUPERVISOR_PERIOD = 0.1
+
     def set_client_address(self, local_ip_address):
         if not self.__is_locked:
             self.local_ip_address = local_ip_address
@@ -145,6 +235,16 @@ class NatNetClient:
         if not self.__is_locked:
             self.use_multicast = use_multicast
 
+    def set_auto_reconnect(self, auto_reconnect, stream_timeout=1.0):
+        if not self.__is_locked:
+            self.auto_reconnect = auto_reconnect
+            self.stream_timeout = stream_timeout
+
+    def set_use_frame_pool(self, use_frame_pool, pool_size=2):
+        if not self.__is_locked:
+            self.use_frame_pool = use_frame_pool
+            self.frame_pool_size = pool_size
+
     def can_change_bitstream_version(self):
         return self.__can_change_bitstream_version
 
@@ -157,8 +257,8 @@ class NatNetClient:
             and (minor != self.__nat_net_requested_version[1])
         ):
             sz_command = "Bitstream,%1.1d.%1.1d" % (major, minor)
-            return_code = self.send_command(sz_command)
-            if return_code >= 0:
+            if self.wait_for_reply(self.send_command_async(sz_command)) is not None:
+                return_code = 0
                 self.__nat_net_requested_version[0] = major
                 self.__nat_net_requested_version[1] = minor
                 self.__nat_net_requested_version[2] = 0
@@ -168,17 +268,16 @@ class NatNetClient:
                 # print_results = self.get_print_results()
                 # turn off output
                 # self.set_print_results(False)
-                # force frame send and play reset
-                self.send_command("TimelinePlay")
-                time.sleep(0.1)
+                # force frame send and play reset, each command waits for its reply
                 tmpCommands = [
+                    "TimelinePlay",
                     "TimelinePlay",
                     "TimelineStop",
                     "SetPlaybackCurrentFrame,0",
                     "TimelineStop",
                 ]
-                self.send_commands(tmpCommands, False)
-                time.sleep(2)
+                for sz_command in tmpCommands:
+                    self.wait_for_reply(self.send_command_async(sz_command))
                 # reset to original output state
                 # self.set_print_results(print_results)
         return return_code
@@ -343,7 +442,7 @@ class NatNetClient:
         return result
 
     # Unpack a rigid body object from a data packet
-    def __unpack_rigid_body(self, data, major, minor, rb_num):
+    def __unpack_rigid_body(self, data, major, minor, rb_num, rigid_body_data=None):
         offset = 0
 
         # ID (4 bytes)
@@ -364,11 +463,10 @@ class NatNetClient:
             % (rot[0], rot[1], rot[2], rot[3])
         )
 
-        rigid_body = MoCapData.RigidBody(new_id, pos, rot)
-
-        # Send information to any listener.
-        if self.rigid_body_listener is not None:
-            self.rigid_body_listener(new_id, pos, rot)
+        if rigid_body_data is not None:
+            rigid_body = rigid_body_data.next_rigid_body(new_id, pos, rot)
+        else:
+            rigid_body = MoCapData.RigidBody(new_id, pos, rot)
 
         # RB Marker Data ( Before version 3.0.  After Version 3.0 Marker data is in description )
         if major < 3 and major != 0:
@@ -427,17 +525,32 @@ class NatNetClient:
                 rigid_body.tracking_valid = True
             else:
                 rigid_body.tracking_valid = False
+        else:
+            # no tracking flag before 2.6, every streamed pose counts
+            tracking_valid = True
+
+        if tracking_valid:
+            self.__valid_frame_counts[rigid_body.id_num] = (
+                self.__valid_frame_counts.get(rigid_body.id_num, 0) + 1
+            )
+            # Send information to any listener. Motive keeps streaming bodies it
+            # has lost with the valid flag cleared, their poses are meaningless.
+            if self.rigid_body_listener is not None:
+                self.rigid_body_listener(rigid_body.id_num, rigid_body.pos, rigid_body.rot)
 
         return offset, rigid_body
 
     # Unpack a skeleton object from a data packet
-    def __unpack_skeleton(self, data, major, minor):
+    def __unpack_skeleton(self, data, major, minor, skeleton_data=None):
 
         offset = 0
         new_id = int.from_bytes(data[offset : offset + 4], byteorder="little")
         offset += 4
         trace_mf("ID:", new_id)
-        skeleton = MoCapData.Skeleton(new_id)
+        if skeleton_data is not None:
+            skeleton = skeleton_data.next_skeleton(new_id)
+        else:
+            skeleton = MoCapData.Skeleton(new_id)
 
         rigid_body_count = int.from_bytes(data[offset : offset + 4], byteorder="little")
         offset += 4
@@ -452,17 +565,22 @@ class NatNetClient:
         return offset, skeleton
 
     # Unpack Mocap Data Functions
-    def __unpack_frame_prefix_data(self, data):
+    def __unpack_frame_prefix_data(self, data, frame_prefix_data=None):
         offset = 0
         # Frame number (4 bytes)
         frame_number = int.from_bytes(data[offset : offset + 4], byteorder="little")
         offset += 4
         trace_mf("Frame #:", frame_number)
-        frame_prefix_data = MoCapData.FramePrefixData(frame_number)
+        if frame_prefix_data is not None:
+            frame_prefix_data.frame_number = frame_number
+        else:
+            frame_prefix_data = MoCapData.FramePrefixData(frame_number)
         return offset, frame_prefix_data
 
-    def __unpack_marker_set_data(self, data, packet_size, major, minor):
-        marker_set_data = MoCapData.MarkerSetData()
+    def __unpack_marker_set_data(self, data, packet_size, major, minor, marker_set_data=None):
+        pooled = marker_set_data is not None
+        if not pooled:
+            marker_set_data = MoCapData.MarkerSetData()
         offset = 0
         # Marker set count (4 bytes)
         marker_set_count = int.from_bytes(data[offset : offset + 4], byteorder="little")
@@ -470,7 +588,10 @@ class NatNetClient:
         trace_mf("Marker Set Count:", marker_set_count)
 
         for i in range(0, marker_set_count):
-            marker_data = MoCapData.MarkerData()
+            if pooled:
+                marker_data = marker_set_data.next_marker_data()
+            else:
+                marker_data = MoCapData.MarkerData()
             # Model name
             model_name, separator, remainder = bytes(data[offset:]).partition(b"\0")
             offset += len(model_name) + 1
@@ -488,7 +609,8 @@ class NatNetClient:
                     "\tMarker %3.1d : [%3.2f,%3.2f,%3.2f]" % (j, pos[0], pos[1], pos[2])
                 )
                 marker_data.add_pos(pos)
-            marker_set_data.add_marker_data(marker_data)
+            if not pooled:
+                marker_set_data.add_marker_data(marker_data)
 
         # Unlabeled markers count (4 bytes)
         unlabeled_markers_count = int.from_bytes(
@@ -506,8 +628,10 @@ class NatNetClient:
             marker_set_data.add_unlabeled_marker(pos)
         return offset, marker_set_data
 
-    def __unpack_rigid_body_data(self, data, packet_size, major, minor):
-        rigid_body_data = MoCapData.RigidBodyData()
+    def __unpack_rigid_body_data(self, data, packet_size, major, minor, rigid_body_data=None):
+        pooled = rigid_body_data is not None
+        if not pooled:
+            rigid_body_data = MoCapData.RigidBodyData()
         offset = 0
         # Rigid body count (4 bytes)
         rigid_body_count = int.from_bytes(data[offset : offset + 4], byteorder="little")
@@ -515,16 +639,23 @@ class NatNetClient:
         trace_mf("Rigid Body Count:", rigid_body_count)
 
         for i in range(0, rigid_body_count):
-            offset_tmp, rigid_body = self.__unpack_rigid_body(
-                data[offset:], major, minor, i
-            )
+            if pooled:
+                offset_tmp, rigid_body = self.__unpack_rigid_body(
+                    data[offset:], major, minor, i, rigid_body_data
+                )
+            else:
+                offset_tmp, rigid_body = self.__unpack_rigid_body(
+                    data[offset:], major, minor, i
+                )
+                rigid_body_data.add_rigid_body(rigid_body)
             offset += offset_tmp
-            rigid_body_data.add_rigid_body(rigid_body)
 
         return offset, rigid_body_data
 
-    def __unpack_skeleton_data(self, data, packet_size, major, minor):
-        skeleton_data = MoCapData.SkeletonData()
+    def __unpack_skeleton_data(self, data, packet_size, major, minor, skeleton_data=None):
+        pooled = skeleton_data is not None
+        if not pooled:
+            skeleton_data = MoCapData.SkeletonData()
 
         offset = 0
         # Version 2.1 and later
@@ -536,11 +667,16 @@ class NatNetClient:
             offset += 4
             trace_mf("Skeleton Count:", skeleton_count)
             for _ in range(0, skeleton_count):
-                rel_offset, skeleton = self.__unpack_skeleton(
-                    data[offset:], major, minor
-                )
+                if pooled:
+                    rel_offset, skeleton = self.__unpack_skeleton(
+                        data[offset:], major, minor, skeleton_data
+                    )
+                else:
+                    rel_offset, skeleton = self.__unpack_skeleton(
+                        data[offset:], major, minor
+                    )
+                    skeleton_data.add_skeleton(skeleton)
                 offset += rel_offset
-                skeleton_data.add_skeleton(skeleton)
 
         return offset, skeleton_data
 
@@ -551,8 +687,10 @@ class NatNetClient:
         marker_id = new_id & 0x0000FFFF
         return model_id, marker_id
 
-    def __unpack_labeled_marker_data(self, data, packet_size, major, minor):
-        labeled_marker_data = MoCapData.LabeledMarkerData()
+    def __unpack_labeled_marker_data(self, data, packet_size, major, minor, labeled_marker_data=None):
+        pooled = labeled_marker_data is not None
+        if not pooled:
+            labeled_marker_data = MoCapData.LabeledMarkerData()
         offset = 0
         # Labeled markers (Version 2.3 and later)
         labeled_marker_count = 0
@@ -595,15 +733,22 @@ class NatNetClient:
                     offset += 4
                     trace_mf("  err  : [%3.2f]" % residual)
 
-                labeled_marker = MoCapData.LabeledMarker(
-                    tmp_id, pos, size, param, residual
-                )
-                labeled_marker_data.add_labeled_marker(labeled_marker)
+                if pooled:
+                    labeled_marker_data.next_labeled_marker(
+                        tmp_id, pos, size, param, residual
+                    )
+                else:
+                    labeled_marker = MoCapData.LabeledMarker(
+                        tmp_id, pos, size, param, residual
+                    )
+                    labeled_marker_data.add_labeled_marker(labeled_marker)
 
         return offset, labeled_marker_data
 
-    def __unpack_force_plate_data(self, data, packet_size, major, minor):
-        force_plate_data = MoCapData.ForcePlateData()
+    def __unpack_force_plate_data(self, data, packet_size, major, minor, force_plate_data=None):
+        pooled = force_plate_data is not None
+        if not pooled:
+            force_plate_data = MoCapData.ForcePlateData()
         n_frames_show_max = 4
         offset = 0
         # Force Plate data (version 2.9 and later)
@@ -620,7 +765,10 @@ class NatNetClient:
                     data[offset : offset + 4], byteorder="little"
                 )
                 offset += 4
-                force_plate = MoCapData.ForcePlate(force_plate_id)
+                if pooled:
+                    force_plate = force_plate_data.next_force_plate(force_plate_id)
+                else:
+                    force_plate = MoCapData.ForcePlate(force_plate_id)
 
                 # Channel Count
                 force_plate_channel_count = int.from_bytes(
@@ -665,11 +813,14 @@ class NatNetClient:
                         )
                     trace_mf("%s" % out_string)
                     force_plate.add_channel_data(fp_channel_data)
-                force_plate_data.add_force_plate(force_plate)
+                if not pooled:
+                    force_plate_data.add_force_plate(force_plate)
         return offset, force_plate_data
 
-    def __unpack_device_data(self, data, packet_size, major, minor):
-        device_data = MoCapData.DeviceData()
+    def __unpack_device_data(self, data, packet_size, major, minor, device_data=None):
+        pooled = device_data is not None
+        if not pooled:
+            device_data = MoCapData.DeviceData()
         n_frames_show_max = 4
         offset = 0
         # Device data (version 2.11 and later)
@@ -685,7 +836,10 @@ class NatNetClient:
                     data[offset : offset + 4], byteorder="little"
                 )
                 offset += 4
-                device = MoCapData.Device(device_id)
+                if pooled:
+                    device = device_data.next_device(device_id)
+                else:
+                    device = MoCapData.Device(device_id)
                 # Channel Count
                 device_channel_count = int.from_bytes(
                     data[offset : offset + 4], byteorder="little"
@@ -730,11 +884,13 @@ class NatNetClient:
                         )
                     trace_mf("%s" % out_string)
                     device.add_channel_data(device_channel_data)
-                device_data.add_device(device)
+                if not pooled:
+                    device_data.add_device(device)
         return offset, device_data
 
-    def __unpack_frame_suffix_data(self, data, packet_size, major, minor):
-        frame_suffix_data = MoCapData.FrameSuffixData()
+    def __unpack_frame_suffix_data(self, data, packet_size, major, minor, frame_suffix_data=None):
+        if frame_suffix_data is None:
+            frame_suffix_data = MoCapData.FrameSuffixData()
         offset = 0
 
         # Timecode
@@ -794,21 +950,36 @@ class NatNetClient:
 
     # Unpack data from a motion capture frame message
     def __unpack_mocap_data(self, data: bytes, packet_size, major, minor):
-        mocap_data = MoCapData.MoCapData()
+        # In frame pool mode every part of the frame is overwritten in place
+        if self.__frame_pool is not None:
+            mocap_data = self.__frame_pool.acquire()
+        else:
+            mocap_data = MoCapData.MoCapData()
         trace_mf("MoCap Frame Begin\n-----------------")
+        self.__frame_count += 1
         data = memoryview(data)
         offset = 0
         rel_offset = 0
 
         # Frame Prefix Data
-        rel_offset, frame_prefix_data = self.__unpack_frame_prefix_data(data[offset:])
+        rel_offset, frame_prefix_data = self.__unpack_frame_prefix_data(
+            data[offset:], mocap_data.prefix_data
+        )
         offset += rel_offset
         mocap_data.set_prefix_data(frame_prefix_data)
         frame_number = frame_prefix_data.frame_number
+        self.frame_number = frame_number
+        if self.frame_period is not None:
+            self.frame_timestamp = (
+                self.__last_frame_timestamp
+                + (frame_number - self.__last_frame_number) * self.frame_period
+            )
+        else:
+            self.frame_timestamp = None
 
         # Marker Set Data
         rel_offset, marker_set_data = self.__unpack_marker_set_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.marker_set_data
         )
         offset += rel_offset
         mocap_data.set_marker_set_data(marker_set_data)
@@ -817,7 +988,7 @@ class NatNetClient:
 
         # Rigid Body Data
         rel_offset, rigid_body_data = self.__unpack_rigid_body_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.rigid_body_data
         )
         offset += rel_offset
         mocap_data.set_rigid_body_data(rigid_body_data)
@@ -825,7 +996,7 @@ class NatNetClient:
 
         # Skeleton Data
         rel_offset, skeleton_data = self.__unpack_skeleton_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.skeleton_data
         )
         offset += rel_offset
         mocap_data.set_skeleton_data(skeleton_data)
@@ -833,7 +1004,7 @@ class NatNetClient:
 
         # Labeled Marker Data
         rel_offset, labeled_marker_data = self.__unpack_labeled_marker_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.labeled_marker_data
         )
         offset += rel_offset
         mocap_data.set_labeled_marker_data(labeled_marker_data)
@@ -841,14 +1012,14 @@ class NatNetClient:
 
         # Force Plate Data
         rel_offset, force_plate_data = self.__unpack_force_plate_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.force_plate_data
         )
         offset += rel_offset
         mocap_data.set_force_plate_data(force_plate_data)
 
         # Device Data
         rel_offset, device_data = self.__unpack_device_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.device_data
         )
         offset += rel_offset
         mocap_data.set_device_data(device_data)
@@ -856,7 +1027,7 @@ class NatNetClient:
         # Frame Suffix Data
         # rel_offset, timecode, timecode_sub, timestamp, is_recording, tracked_models_changed = \
         rel_offset, frame_suffix_data = self.__unpack_frame_suffix_data(
-            data[offset:], (packet_size - offset), major, minor
+            data[offset:], (packet_size - offset), major, minor, mocap_data.suffix_data
         )
         offset += rel_offset
         mocap_data.set_suffix_data(frame_suffix_data)
@@ -866,6 +1037,17 @@ class NatNetClient:
         timestamp = frame_suffix_data.timestamp
         is_recording = frame_suffix_data.is_recording
         tracked_models_changed = frame_suffix_data.tracked_models_changed
+        if self.__last_frame_number is not None:
+            frames = frame_number - self.__last_frame_number
+            if frames > 0 and timestamp > self.__last_frame_timestamp:
+                self.frame_period = (timestamp - self.__last_frame_timestamp) / frames
+        self.__last_frame_number = frame_number
+        self.__last_frame_timestamp = timestamp
+        self.frame_timestamp = timestamp
+        if self.high_res_clock_frequency and frame_suffix_data.stamp_transmit > 0:
+            self.frame_latency = (
+                frame_suffix_data.stamp_transmit - frame_suffix_data.stamp_camera_mid_exposure
+            ) / self.high_res_clock_frequency
         # Send information to any listener.
         if self.new_frame_listener is not None:
             data_dict = {}
@@ -882,6 +1064,16 @@ class NatNetClient:
             data_dict["tracked_models_changed"] = tracked_models_changed
 
             self.new_frame_listener(data_dict)
+        # Keep the data descriptions current as rigid bodies are added or renamed in Motive
+        if (
+            tracked_models_changed
+            and self.data_descriptions_listener is not None
+            and time.monotonic() - self.__model_def_request_time
+            > self.MODEL_DEF_REFRESH_INTERVAL
+        ):
+            self.request_model_definitions()
+        if self.mocap_data_listener is not None:
+            self.mocap_data_listener(mocap_data)
         trace_mf("MoCap Frame End\n-----------------")
         return offset, mocap_data
 
@@ -1299,6 +1491,11 @@ class NatNetClient:
         self.__nat_net_stream_version_server[1] = nnsvs[1]
         self.__nat_net_stream_version_server[2] = nnsvs[2]
         self.__nat_net_stream_version_server[3] = nnsvs[3]
+
+        # High resolution clock frequency (Version 3.0 and later)
+        if nnsvs[0] >= 3 and packet_size - offset >= 8:
+            (self.high_res_clock_frequency,) = struct.unpack("<Q", data[offset : offset + 8])
+            offset += 8
         if (self.__nat_net_requested_version[0] == 0) and (
             self.__nat_net_requested_version[1] == 0
         ):
@@ -1409,6 +1606,11 @@ class NatNetClient:
             # Block for input
             try:
                 data, addr = in_socket.recvfrom(recv_buffer_size)
+                self.__last_data_time = time.monotonic()
+                self.receive_time = time.perf_counter()
+            except socket.timeout:
+                # Silence is handled by the supervisor, just check for stop requests
+                continue
             except socket.error as msg:
                 if not stop():
                     print("ERROR: data socket access error occurred:\n  %s" % msg)
@@ -1479,10 +1681,10 @@ class NatNetClient:
             )
             offset += offset_tmp
             trace("MoCap Frame: %d\n" % (mocap_data.prefix_data.frame_number))
-            # get a string version of the data for output
-            mocap_data_str = mocap_data.get_as_string()
-            # if print_level >= 1:
-            #     print("%s\n"%mocap_data_str)
+            if print_level >= 1:
+                # get a string version of the data for output
+                mocap_data_str = mocap_data.get_as_string()
+                # print("%s\n"%mocap_data_str)
 
         elif message_id == self.NAT_MODELDEF:
             trace("Message ID  : %3.1d NAT_MODELDEF" % message_id)
@@ -1491,6 +1693,10 @@ class NatNetClient:
                 data[offset:], packet_size, major, minor
             )
             offset += offset_tmp
+            self.data_descriptions = data_descs
+            if self.data_descriptions_listener is not None:
+                self.data_descriptions_listener(data_descs)
+            self.__resolve_reply(message_id, data_descs)
             print("Data Descriptions:\n")
             # get a string version of the data for output
             data_descs_str = data_descs.get_as_string()
@@ -1503,6 +1709,7 @@ class NatNetClient:
             offset += self.__unpack_server_info(
                 data[offset:], packet_size, major, minor
             )
+            self.__resolve_reply(message_id, list(self.__server_version))
 
         elif message_id == self.NAT_RESPONSE:
             trace("Message ID  : %3.1d NAT_RESPONSE" % message_id)
@@ -1513,6 +1720,7 @@ class NatNetClient:
                 )
                 offset += 4
                 trace("Command response: %d" % command_response)
+                self.__resolve_reply(message_id, command_response)
             else:
                 show_remainder = False
                 message, separator, remainder = bytes(data[offset:]).partition(b"\0")
@@ -1528,10 +1736,14 @@ class NatNetClient:
                     )
                 else:
                     trace("Command response:", message.decode("utf-8"))
+                self.__resolve_reply(message_id, message.decode("utf-8"))
         elif message_id == self.NAT_UNRECOGNIZED_REQUEST:
             trace("Message ID  : %3.1d NAT_UNRECOGNIZED_REQUEST: " % message_id)
             trace("Packet Size : ", packet_size)
             trace("Received 'Unrecognized request' from server")
+            self.__resolve_reply(
+                message_id, RuntimeError("Request not recognized by server")
+            )
         elif message_id == self.NAT_MESSAGESTRING:
             trace("Message ID  : %3.1d NAT_MESSAGESTRING" % message_id)
             trace("Packet Size : ", packet_size)
@@ -1572,6 +1784,117 @@ class NatNetClient:
 
         return in_socket.sendto(data, address)
 
+    def __resolve_reply(self, message_id, result):
+        """Complete the oldest pending request answered by this message id"""
+        future = None
+        with self.__pending_replies_lock:
+            for pending in list(self.__pending_replies):
+                reply_ids, pending_future = pending
+                if pending_future.done():
+                    # timed out or cancelled by the caller
+                    self.__pending_replies.remove(pending)
+                elif message_id in reply_ids:
+                    self.__pending_replies.remove(pending)
+                    future = pending_future
+                    break
+        if future is None or not future.set_running_or_notify_cancel():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def __cancel_pending_replies(self):
+        with self.__pending_replies_lock:
+            for _, future in self.__pending_replies:
+                future.cancel()
+            self.__pending_replies.clear()
+
+    def send_request_async(self, command, command_str=""):
+        """Send a request on the command socket.
+        Returns a concurrent.futures.Future resolved with the decoded reply:
+        the server version for NAT_CONNECT, the response for NAT_REQUEST and
+        the DataDescriptions for NAT_REQUEST_MODELDEF."""
+        future = concurrent.futures.Future()
+        # register before sending, the reply can arrive before sendto returns
+        with self.__pending_replies_lock:
+            self.__pending_replies.append((self.REPLY_IDS[command], future))
+        try:
+            self.send_request(
+                self.command_socket,
+                command,
+                command_str,
+                (self.server_ip_address, self.command_port),
+            )
+        except (socket.error, AttributeError) as msg:
+            # AttributeError: no command socket yet
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Could not send request: %s" % msg))
+        return future
+
+    def send_command_async(self, command_str):
+        return self.send_request_async(self.NAT_REQUEST, command_str)
+
+    def wait_for_reply(self, future, timeout=None):
+        """Wait for a request's reply, returns None if it failed or did not arrive in time"""
+        if timeout is None:
+            timeout = self.COMMAND_TIMEOUT
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # stop the reply being matched to this request if it turns up late
+            future.cancel()
+            print("ERROR: no reply from server within %3.2f s" % timeout)
+        except concurrent.futures.CancelledError:
+            pass
+        except RuntimeError as msg:
+            print("ERROR: %s" % msg)
+        return None
+
+    def wait_for_server_info(self, timeout=None):
+        """Block until the server info requested by run() has arrived"""
+        if self.__server_info_reply is None:
+            return False
+        return self.wait_for_reply(self.__server_info_reply, timeout) is not None
+
+    def wait_until_streaming(self, bodies, timeout, expected_rate=None, window=0.5):
+        """Block until the server info is known and every rigid body id in bodies
+        streams valid poses at the expected rate (the measured frame rate if not
+        given), or until timeout seconds have passed.
+        Returns the stream rate in Hz measured over the last window and the list
+        of bodies that are missing or not streaming fast enough."""
+        deadline = time.monotonic() + timeout
+        missing = list(bodies)
+        stream_rate = 0.0
+        if not self.wait_for_server_info(timeout):
+            return stream_rate, missing
+
+        while True:
+            start = time.monotonic()
+            start_frame_count = self.__frame_count
+            start_valid_counts = dict(self.__valid_frame_counts)
+            time.sleep(max(0.0, min(window, deadline - start)))
+            elapsed = time.monotonic() - start
+            if elapsed <= 0:
+                # the server info used up the timeout, nothing was measured
+                return stream_rate, missing
+            valid_counts = dict(self.__valid_frame_counts)
+
+            stream_rate = (self.__frame_count - start_frame_count) / elapsed
+            required_rate = self.MIN_STREAMING_FRACTION * (
+                stream_rate if expected_rate is None else expected_rate
+            )
+            missing = [
+                body
+                for body in bodies
+                if stream_rate == 0
+                or (valid_counts.get(body, 0) - start_valid_counts.get(body, 0))
+                / elapsed
+                < required_rate
+            ]
+            if not missing or time.monotonic() >= deadline:
+                return stream_rate, missing
+
     def send_command(self, command_str):
         nTries = 3
         ret_val = -1
@@ -1595,6 +1918,11 @@ class NatNetClient:
             if print_results:
                 print("Command: %s - return_code: %d" % (sz_command, return_code))
 
+    def request_model_definitions(self):
+        """Ask the server to (re)send its data descriptions, returns a Future of them"""
+        self.__model_def_request_time = time.monotonic()
+        return self.send_request_async(self.NAT_REQUEST_MODELDEF)
+
     def send_keep_alive(self, in_socket, server_ip_address, server_port):
         return self.send_request(
             in_socket, self.NAT_KEEPALIVE, "", (server_ip_address, server_port)
@@ -1615,19 +1943,24 @@ class NatNetClient:
     def get_server_version(self):
         return self.__server_version
 
-    def run(self):
+    def __start_stream(self):
+        """Create the sockets and receiver threads and connect to the server"""
         # Create the data socket
         self.data_socket = self.__create_data_socket(self.data_port)
         if self.data_socket is None:
             print("Could not open data channel")
             return False
+        # Wake up regularly so the thread can be stopped even if no data arrives
+        self.data_socket.settimeout(self.DATA_SOCKET_TIMEOUT)
 
         # Create the command socket
         self.command_socket = self.__create_command_socket()
         if self.command_socket is None:
             print("Could not open command channel")
+            # Do not leak the bound data socket on every retry
+            self.data_socket.close()
+            self.data_socket = None
             return False
-        self.__is_locked = True
 
         self.stop_threads = False
         # Create a separate thread for receiving data packets
@@ -1638,6 +1971,7 @@ class NatNetClient:
                 lambda: self.stop_threads,
                 lambda: self.print_level,
             ),
+            daemon=True,
         )
         self.data_thread.start()
 
@@ -1649,17 +1983,105 @@ class NatNetClient:
                 lambda: self.stop_threads,
                 lambda: self.print_level,
             ),
+            daemon=True,
         )
         self.command_thread.start()
 
         # Required for setup
         # Get NatNet and server versions
-        self.send_request(
-            self.command_socket,
-            self.NAT_CONNECT,
-            "",
-            (self.server_ip_address, self.command_port),
-        )
+        self.__server_info_reply = self.send_request_async(self.NAT_CONNECT)
+
+        # Request the model definitions for anyone mapping names to streaming ids
+        if self.data_descriptions_listener is not None:
+            self.request_model_definitions()
+        return True
+
+    def __stop_stream(self):
+        """Stop the receiver threads and close the sockets"""
+        self.stop_threads = True
+        # replies to requests on the old sockets will never arrive
+        self.__cancel_pending_replies()
+        # closing sockets causes blocking recvfrom to throw
+        # an exception and break the loop
+        if self.command_socket is not None:
+            self.command_socket.close()
+        if self.data_socket is not None:
+            self.data_socket.close()
+        # attempt to join the threads back.
+        if self.command_thread is not None:
+            self.command_thread.join()
+        if self.data_thread is not None:
+            self.data_thread.join()
+
+    def __supervisor_thread_function(self, stop):
+        recovery_start = None
+        outage_start = 0.0
+        attempts = 0
+        while not stop():
+            time.sleep(self.SUPERVISOR_PERIOD)
+            last_data_time = self.__last_data_time
+
+            if recovery_start is not None and last_data_time > recovery_start:
+                recovery_duration = last_data_time - recovery_start
+                self.recovery_count += 1
+                self.last_recovery_duration = recovery_duration
+                print(
+                    "NatNet stream recovered in %3.2f s after %d attempt(s), no data for %3.2f s"
+                    % (recovery_duration, attempts, last_data_time - outage_start)
+                )
+                if self.stream_recovered_listener is not None:
+                    self.stream_recovered_listener(recovery_duration)
+                recovery_start = None
+
+            # Give every (re)started stream stream_timeout seconds to deliver data
+            silence = time.monotonic() - max(last_data_time, self.__stream_start_time)
+            if stop() or silence < self.stream_timeout:
+                continue
+
+            if recovery_start is None:
+                print("WARNING: no NatNet data for %3.2f s, reconnecting" % silence)
+                recovery_start = time.monotonic()
+                outage_start = last_data_time
+                attempts = 0
+            attempts += 1
+
+            # Forget the old server info so connected() reflects the refreshed one
+            self.__application_name = "Not Set"
+            self.__server_version[:] = [0, 0, 0, 0]
+            self.__stream_start_time = time.monotonic()
+            try:
+                self.__stop_stream()
+                if not stop():
+                    self.__start_stream()
+            except Exception as msg:
+                print("ERROR: reconnect attempt failed:\n  %s" % msg)
+        return 0
+
+    def run(self, server_info_timeout=None):
+        """Start streaming. With a server_info_timeout, also wait (at most that
+        many seconds) for the server info and fail if it does not arrive."""
+        if self.use_frame_pool:
+            self.__frame_pool = MoCapData.MoCapDataPool(self.frame_pool_size)
+
+        self.__stream_start_time = time.monotonic()
+        if not self.__start_stream():
+            return False
+        self.__is_locked = True
+
+        # Create a separate thread that restarts the stream when it goes quiet
+        if self.auto_reconnect:
+            self.stop_supervisor = False
+            self.supervisor_thread = Thread(
+                target=self.__supervisor_thread_function,
+                args=(lambda: self.stop_supervisor,),
+                daemon=True,
+            )
+            self.supervisor_thread.start()
+
+        if server_info_timeout is not None:
+            if not self.wait_for_server_info(server_info_timeout):
+                print("Server info not received")
+                return False
 
         ##Example Commands
         ## Get NatNet and server versions
@@ -1670,11 +2092,8 @@ class NatNetClient:
 
     def shutdown(self):
         print("shutdown called")
-        self.stop_threads = True
-        # closing sockets causes blocking recvfrom to throw
-        # an exception and break the loop
-        self.command_socket.close()
-        self.data_socket.close()
-        # attempt to join the threads back.
-        self.command_thread.join()
-        self.data_thread.join()
+        # stop the supervisor first so it does not restart the stream
+        self.stop_supervisor = True
+        if self.supervisor_thread is not None:
+            self.supervisor_thread.join()
+        self.__stop_stream()
@@ -20,6 +20,35 @@ RUN_TIME = 15  # Doesn't include takeoff and landing time
 
 USE_FULL_POSE = False
 
+# Send poses from one worker thread per radio instead of the NatNet data thread
+USE_POSE_TRANSMITTERS = True
+
+# Broadcast the positions of every drone on a radio in packed packets, once per
+# mocap frame, instead of one extpos packet per drone (position only, implies
+# pose transmitters). The drones must share the last 4 address bytes with the
+# broadcast address and differ in the first one.
+USE_PACKED_POSE_BROADCAST = False
+BROADCAST_ADDRESS = "FFE7E7E7E7"
+# radio of the links (e.g. "radio://0") -> index of a spare Crazyradio that only
+# sends their broadcasts, with ACKs off. Radios without one share the dongle
+# with the links, and every link on it loses its retries during a broadcast.
+BROADCAST_RADIOS = {}
+
+# Poses are forwarded to each drone at POSE_RATE (Hz), or every
+# POSE_EVERY_NTH_FRAME mocap frame if set. None for both forwards every frame.
+# The Kalman filter gains little from more than ~100 Hz of extpos, and the
+# excess crowds out setpoints on the same radio.
+POSE_RATE = 100.0
+POSE_EVERY_NTH_FRAME = None
+# agent -> {"rate": hz} or {"every_nth": n}, overrides the defaults above
+POSE_DECIMATION_BY_AGENT = {}
+
+# Extrapolate forwarded positions to when they reach the drone, by the latency
+# Motive measures for each frame plus POSE_TRANSPORT_LATENCY for the network,
+# radio and on-board handling.
+USE_POSE_PREDICTION = False
+POSE_TRANSPORT_LATENCY = 0.01  # in seconds
+
 # TODO document best practices for choosing these
 URIs_by_agent = {
     0: uri_helper.uri_from_env(default=("radio://1/100/2M/E7E7E7E7E0")),
@@ -36,7 +65,53 @@ URIs_by_agent = {
 
 uris = [URIs_by_agent[agent] for agent in AGENTS]
 
+# Name of each agent's rigid body in Motive. Streaming ids are looked up by name
+# whenever Motive sends its data descriptions, until then the streaming id is
+# assumed to be the agent id. Agents whose name is missing are left unmapped.
+RIGID_BODY_NAMES_BY_AGENT = {agent: f"cf{agent}" for agent in URIs_by_agent}
+agent_by_rigid_body_id = {agent: agent for agent in AGENTS}
+
+# rigid body id -> (crazyflie, agent index, send function, PoseDecimator,
+# PosePredictor or None), filled in once the swarm links are open. Poses of
+# rigid bodies without a route are dropped and counted.
+pose_routes = {}
+unrouted_pose_count = 0
+
+# radio (e.g. "radio://0") -> PoseTransmitter
+pose_transmitters = {}
+
 swarm: Swarm | None = None
 
+# Recent positions, velocities and accelerations of all agents, see
+# SwarmStateEstimator. Set up with USE_POSE_PREDICTION, which reads it.
+swarm_state = None
+
+# Record latency histograms of every pipeline stage, summarized at shutdown
+TIME_PIPELINE = True
+pipeline_timer = None
+
 formation_controller = None
 CONTROL_PERIOD = 0.03
+# Setpoints are sent whenever the controller publishes a new output, and the
+# last one is repeated after this long without one (hover setpoints hold 500 ms)
+SETPOINT_MAX_HOLD = 0.1
+# but no more often than this, the controller can publish on every mocap frame
+SETPOINT_MIN_INTERVAL = CONTROL_PERIOD
+# Run the control law once per mocap frame, after every agent's position of the
+# frame is in, instead of on every rigid body
+FRAME_SYNCHRONOUS_CONTROL = True
+# Flight record format: ".npy" (memory mappable, metadata in a .json next to it),
+# ".npz", ".zst" (chunked, zstd compressed) or ".csv"
+FLIGHT_RECORD_FORMAT = ".npy"
+# Agents without a new position for STALE_POSITION_TIMEOUT seconds are stale.
+# Their control output is then zero ("hover") or kept at its last value ("hold").
+# "hold" lasts STALE_HOLD_TIME seconds at most, then the agent hovers.
+STALE_POSITION_TIMEOUT = 0.1
+STALE_POSITION_POLICY = "hover"
+STALE_HOLD_TIME = 0.5
+# Evaluate the control law in a worker process, so it does not hold the GIL
+# against the NatNet and radio threads
+CONTROLLER_IN_PROCESS = False
+# Incidence matrix products of the control law: "dense", "sparse" (scipy.sparse,
+# cost grows with the number of edges) or "auto" (sparse for large formations)
+FORMATION_BACKEND = "auto"
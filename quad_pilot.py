@@ -4,14 +4,18 @@ This file contains wrappers for the crazyflie library commands.
 Author: Flynn Lambrechts
 """
 
+import threading
 import time
 
 import numpy as np
 import numpy.typing as npt
 import quad_global_variables as qgv
 from cflib.crazyflie.commander import Commander
+from cflib.crazyflie.swarm import Swarm
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from FormationController import FormationController
+from PeriodicScheduler import PeriodicScheduler
+from PoseTransmitter import radio_of
 
 
 def _get_commander(scf: SyncCrazyflie) -> Commander:
@@ -39,14 +43,14 @@ def land(scf):
     position = qgv.FLY_HEIGHT
     landing_time = 2.0
     sleep_time = 0.1
-    steps = int(landing_time / sleep_time)
     vz = - position / landing_time
 
     print(vz)
 
-    for _ in range(steps):
+    scheduler = PeriodicScheduler(sleep_time)
+    for _ in scheduler.run(duration=landing_time):
         cf.commander.send_velocity_world_setpoint(0, 0, vz, 0)
-        time.sleep(sleep_time)
+    print(f"Landing: {scheduler.summary()}")
 
     cf.commander.send_stop_setpoint()
     # Hand control over to the high level commander to avoid timeout and locking of the Crazyflie
@@ -80,6 +84,7 @@ def set_2D_velocity(scf, vx, vy):
 
     _get_commander(scf).send_hover_setpoint(vx, vy, 0, qgv.FLY_HEIGHT)
     # _get_commander(scf).send_velocity_world_setpoint(vx, vy, 0, 0)
+    return vx, vy
 
 
 def hover(scf: SyncCrazyflie):
@@ -89,14 +94,27 @@ def hover(scf: SyncCrazyflie):
 def hover_sequence(scf: SyncCrazyflie, duration=qgv.RUN_TIME):
     take_off(scf)
 
-    start = time.time()
-    while time.time() - start < duration:
+    scheduler = PeriodicScheduler(0.1)
+    for _ in scheduler.run(duration=duration):
         hover(scf)
-        time.sleep(0.1)
+    print(f"Hover: {scheduler.summary()}")
 
     land(scf)
 
 
+def wait_for_setpoint(controller: FormationController, sequence, last_sent):
+    """
+    Waits for a u newer than sequence, but returns no sooner than
+    SETPOINT_MIN_INTERVAL and no later than SETPOINT_MAX_HOLD after last_sent,
+    so the radio is not flooded and the Crazyflie does not time out.
+    """
+    delay = last_sent + qgv.SETPOINT_MIN_INTERVAL - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    timeout = last_sent + qgv.SETPOINT_MAX_HOLD - time.perf_counter()
+    return controller.wait_for_u(sequence, max(timeout, 0.0))
+
+
 def formation_control_sequence(scf: SyncCrazyflie, agent_id):
     if qgv.formation_controller == None:
         raise RuntimeError("Formation Controller Was None")
@@ -106,17 +124,91 @@ def formation_control_sequence(scf: SyncCrazyflie, agent_id):
 
     print(f"Agent {agent_id} hovering and will start listening to controller")
 
-    start = time.time()
+    end = time.perf_counter() + qgv.RUN_TIME
     agent_index = qgv.AGENTS.index(agent_id)
-
-    while time.time() - start < qgv.RUN_TIME:
-        u = list(qgv.formation_controller.get_u()[:, agent_index])
-        # print(agent_id, *u)
-        set_2D_velocity(scf, *u)
+    sequence = None
+    sending = float("-inf")
+
+    while time.perf_counter() < end:
+        # Send the controller's newest output, at most every SETPOINT_MIN_INTERVAL,
+        # or resend the last one after SETPOINT_MAX_HOLD
+        previous = sequence
+        u, sequence = wait_for_setpoint(qgv.formation_controller, sequence, sending)
+        # print(agent_id, *u[:, agent_index])
+        sending = time.perf_counter()
+        vx, vy = set_2D_velocity(scf, u[0, agent_index], u[1, agent_index])
+        qgv.formation_controller.recorder.set_setpoint(agent_index, vx, vy)
+        record_send_latency(agent_id, sending, sequence != previous)
         # set_2D_velocity(scf, 0, 0)
-        time.sleep(qgv.CONTROL_PERIOD)
 
     print(f"Agent {agent_id} landing")
 
     hover(scf)
     land(scf)
+
+
+def swarm_formation_control_sequence(swarm: Swarm):
+    """
+    Takes off and lands all agents together, and in between sends the
+    setpoints from one dispatcher loop per radio instead of a thread per agent.
+    """
+    if qgv.formation_controller == None:
+        raise RuntimeError("Formation Controller Was None")
+
+    swarm.parallel_safe(take_off)
+    swarm.parallel_safe(hover)
+
+    print("Swarm hovering and will start listening to controller")
+    dispatch_setpoints(swarm, qgv.RUN_TIME)
+
+    print("Swarm landing")
+    swarm.parallel_safe(hover)
+    swarm.parallel_safe(land)
+
+
+def dispatch_setpoints(swarm: Swarm, duration):
+    """
+    Sends the setpoints of all agents whenever u changes, paced as in
+    formation_control_sequence. Each radio's agents are sent from their own
+    thread, so the radios send in parallel and a slow one holds up only its own.
+    """
+    by_radio = {}
+    for agent_index, agent_id in enumerate(qgv.AGENTS):
+        uri = qgv.URIs_by_agent[agent_id]
+        by_radio.setdefault(radio_of(uri), []).append((swarm._cfs[uri], agent_index))
+
+    end = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_dispatch_radio, args=(targets, end), name=f"Setpoints {radio}")
+        for radio, targets in by_radio.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _dispatch_radio(targets, end):
+    controller = qgv.formation_controller
+    sequence = None
+    dispatched = float("-inf")
+    while time.perf_counter() < end:
+        previous = sequence
+        u, sequence = wait_for_setpoint(controller, sequence, dispatched)
+        dispatched = time.perf_counter()
+        for scf, agent_index in targets:
+            sending = time.perf_counter()
+            vx, vy = set_2D_velocity(scf, u[0, agent_index], u[1, agent_index])
+            controller.recorder.set_setpoint(agent_index, vx, vy)
+            record_send_latency(qgv.AGENTS[agent_index], sending, sequence != previous)
+
+
+def record_send_latency(agent_id, sending, new_u):
+    """Time set_2D_velocity and, for a new control output, its age once sent"""
+    timer = qgv.pipeline_timer
+    if timer is None:
+        return
+    sent = time.perf_counter()
+    timer.record("send", agent_id, sent - sending)
+    if new_u:
+        timer.record("u_to_setpoint", agent_id, sent - qgv.formation_controller.u_time)
@@ -40,6 +40,11 @@ from cflib.crazyflie.swarm import Swarm
 
 # --------------- Customary Modules -------------------------------------------
 import quad_global_variables as qgv
+from PoseTransmitter import PackedPoseTransmitter, PoseTransmitter, radio_of
+from PoseDecimator import PoseDecimator
+from PosePredictor import PosePredictor
+from SwarmStateEstimator import SwarmStateEstimator
+from PipelineTimer import PipelineTimer
 
 # --------------- OptiTrack Modules -------------------------------------------
 from optirack.NatNetClient import NatNetClient
@@ -50,6 +55,7 @@ from optirack.NatNetClient import NatNetClient
 # //////////////////////////////////////////////////////////////////////////////
 
 TIME_BUFFER = 0.1  # in seconds
+STREAM_TIMEOUT = 5.0  # in seconds, for Motive to stream every agent
 # //////////////////////////////////////////////////////////////////////////////
 # //                      Set up position streaming                           //
 # //////////////////////////////////////////////////////////////////////////////
@@ -67,45 +73,188 @@ def send_pose_to_cf(cf, pos, rot=None):
         cf.extpos.send_extpos(pos[0], pos[1], pos[2])
 
 
+def send_position_to_cf(cf, pos, rot):
+    send_pose_to_cf(cf, pos)
+
+
+def send_full_pose_to_cf(cf, pos, rot):
+    send_pose_to_cf(cf, pos, rot)
+
+
+# This function returns the transmit worker of the radio a crazyflie is on,
+# starting it the first time the radio is used.
+def get_pose_transmitter(uri, send):
+    radio = radio_of(uri)
+    if radio not in qgv.pose_transmitters:
+        if qgv.USE_PACKED_POSE_BROADCAST and not qgv.USE_FULL_POSE:
+            # same channel and data rate, broadcast address
+            parts = uri.split("/")[:-1] + [qgv.BROADCAST_ADDRESS]
+            dedicated = radio in qgv.BROADCAST_RADIOS
+            if dedicated:
+                parts[2] = str(qgv.BROADCAST_RADIOS[radio])
+            transmitter = PackedPoseTransmitter(radio, send, "/".join(parts), dedicated)
+        else:
+            transmitter = PoseTransmitter(radio, send)
+        transmitter.start()
+        qgv.pose_transmitters[radio] = transmitter
+    return qgv.pose_transmitters[radio]
+
+
+def stop_pose_transmitters():
+    for transmitter in qgv.pose_transmitters.values():
+        transmitter.stop()
+        print(
+            f"{transmitter.radio}: sent {transmitter.sent_count} poses, "
+            f"{transmitter.overwritten_count} replaced by newer ones before sending, "
+            f"{transmitter.failed_count} failed"
+        )
+    qgv.pose_transmitters = {}
+
+
+# This function builds the routing table used by receive_rigid_body_frame,
+# so forwarding a pose is a single lookup. It must be called once the swarm
+# links are open and again whenever the agent to rigid body mapping changes.
+def build_pose_routes():
+    send = send_full_pose_to_cf if qgv.USE_FULL_POSE else send_position_to_cf
+    # Keep the frame grid and history of agents whose route did not change
+    previous_by_agent = {route[1]: route for route in qgv.pose_routes.values()}
+    pose_routes = {}
+    for rigid_body_id, agent_id in qgv.agent_by_rigid_body_id.items():
+        radio = qgv.URIs_by_agent[agent_id]
+        if not radio in qgv.swarm._cfs:
+            print(f"Warning: No open link for agent {agent_id}, streaming id: {rigid_body_id}")
+            continue
+        cf = qgv.swarm._cfs[radio].cf
+        if qgv.USE_POSE_TRANSMITTERS or qgv.USE_PACKED_POSE_BROADCAST:
+            route_send = get_pose_transmitter(radio, send).publish
+        else:
+            route_send = send
+        agent_index = qgv.AGENTS.index(agent_id)
+        previous = previous_by_agent.get(agent_index)
+        if previous is not None and previous[0] is cf and previous[2] == route_send:
+            pose_routes[rigid_body_id] = previous
+            continue
+        decimation = qgv.POSE_DECIMATION_BY_AGENT.get(
+            agent_id, {"rate": qgv.POSE_RATE, "every_nth": qgv.POSE_EVERY_NTH_FRAME}
+        )
+        # Spread the drones over the frames, unless they are sent together anyway
+        phase = 0.0 if qgv.USE_PACKED_POSE_BROADCAST else agent_index / len(qgv.AGENTS)
+        decimator = PoseDecimator(decimation.get("rate"), decimation.get("every_nth"), phase)
+        predictor = PosePredictor(qgv.swarm_state, agent_index) if qgv.USE_POSE_PREDICTION else None
+        pose_routes[rigid_body_id] = (cf, agent_index, route_send, decimator, predictor)
+    qgv.pose_routes = pose_routes
+
+
 # This function gets passed to the NatNetClient and is called every
 # time that a rigid bodies position is received.
 # The pose is then sent to the crazyflie.
 def receive_rigid_body_frame(new_id, position, rotation):
     # print(position)
-    if qgv.swarm != None and qgv.swarm._is_open:
-        radio = qgv.URIs_by_agent[new_id]
-        if not radio in qgv.swarm._cfs:
-            print(
-                f"Warning: Got frame for unexpected crazyflie, streaming id: {new_id}"
-            )
-            return
-        cf = qgv.swarm._cfs[radio].cf
-
-        if qgv.USE_FULL_POSE:
-            send_pose_to_cf(cf, position, rotation)
+    route = qgv.pose_routes.get(new_id)
+    if route is None:
+        # not one of our agents, or the swarm links are not open
+        qgv.unrouted_pose_count += 1
+        return
+    cf, agent_index, send, decimator, predictor = route
+    timer = qgv.pipeline_timer
+    if timer is not None:
+        decoded = time.perf_counter()
+        timer.record("decode", qgv.AGENTS[agent_index], decoded - qgv.pos_stream.receive_time)
+    frame_number = qgv.pos_stream.frame_number
+    frame_period = qgv.pos_stream.frame_period
+    # Motive time of the frame, free of network jitter
+    frame_time = qgv.pos_stream.frame_timestamp
+    if frame_time is not None and qgv.swarm_state is not None:
+        qgv.swarm_state.update(agent_index, position, frame_time)
+    if decimator.accept(frame_number, frame_period):
+        if predictor is not None:
+            latency = qgv.POSE_TRANSPORT_LATENCY
+            if qgv.pos_stream.frame_latency is not None:
+                latency += qgv.pos_stream.frame_latency
+            send(cf, predictor.predict(position, latency), rotation)
         else:
-            send_pose_to_cf(cf, position)
+            send(cf, position, rotation)
+    if timer is not None:
+        routed = time.perf_counter()
+        timer.record("route", qgv.AGENTS[agent_index], routed - decoded)
 
-        if qgv.formation_controller != None:
-            # print(position)
-            qgv.formation_controller.update(new_id, position[0:2])
+    if qgv.formation_controller != None:
+        # print(position)
+        qgv.formation_controller.update(qgv.AGENTS[agent_index], position, frame_time)
+        if timer is not None:
+            timer.record("update", qgv.AGENTS[agent_index], time.perf_counter() - routed)
 
 
+# This function gets passed to the NatNetClient and is called once all
+# rigid bodies of a frame have been received.
 def receive_new_frame(data_dict):
-    pass
+    if qgv.pipeline_timer is not None and qgv.pos_stream.frame_latency is not None:
+        qgv.pipeline_timer.record("mocap", None, qgv.pos_stream.frame_latency)
+    for transmitter in qgv.pose_transmitters.values():
+        transmitter.end_frame()
+    if qgv.swarm_state is not None:
+        # for the predictions of the next frame
+        qgv.swarm_state.refresh()
+    if qgv.formation_controller != None:
+        qgv.formation_controller.end_frame(data_dict["timestamp"])
+
+
+# This function gets passed to the NatNetClient and is called every
+# time Motive sends its data descriptions (at startup and when the scene changes).
+# Each agent is mapped to the streaming id of its rigid body by name. Agents
+# without a rigid body are left out, their id could be another body's streaming id.
+def receive_data_descriptions(data_descs):
+    agent_by_rigid_body_id = {}
+    for agent_id in qgv.AGENTS:
+        name = qgv.RIGID_BODY_NAMES_BY_AGENT[agent_id]
+        rigid_body = data_descs.get_rigid_body_by_name(name)
+        if rigid_body is None:
+            print(f"Warning: No rigid body named '{name}' in Motive for agent {agent_id}")
+        else:
+            agent_by_rigid_body_id[rigid_body.id_num] = agent_id
+    # Swap the whole mapping so the data thread never sees a partial update
+    qgv.agent_by_rigid_body_id = agent_by_rigid_body_id
+    if qgv.pose_routes:
+        build_pose_routes()
 
 
 # This function sets up the position streaming
 def setup_pos_stream():
+    # Only estimated while something reads it
+    if qgv.USE_POSE_PREDICTION:
+        qgv.swarm_state = SwarmStateEstimator(len(qgv.AGENTS))
+    if qgv.TIME_PIPELINE:
+        qgv.pipeline_timer = PipelineTimer()
     qgv.pos_stream = NatNetClient()
     # These functions will be called in the background whenever the relevant
     # frame is recieved from motive.
     qgv.pos_stream.new_frame_listener = receive_new_frame
     qgv.pos_stream.rigid_body_listener = receive_rigid_body_frame
+    qgv.pos_stream.data_descriptions_listener = receive_data_descriptions
+    # Only per-rigid-body tuples are used, so frame containers can be recycled
+    qgv.pos_stream.set_use_frame_pool(True)
 
     if not qgv.pos_stream.run():
         print("Could not get Rigid Body positions")
+        qgv.pos_stream.shutdown()
+        exit(1)
+
+    # Wait for the rigid body names to be mapped, then for every agent to be tracked
+    qgv.pos_stream.wait_for_reply(qgv.pos_stream.request_model_definitions())
+    stream_rate, missing = qgv.pos_stream.wait_until_streaming(
+        list(qgv.agent_by_rigid_body_id), STREAM_TIMEOUT
+    )
+    missing_agents = [qgv.agent_by_rigid_body_id[body] for body in missing]
+    # and those without a rigid body at all
+    missing_agents += [
+        agent for agent in qgv.AGENTS if agent not in qgv.agent_by_rigid_body_id.values()
+    ]
+    if missing_agents:
+        print(f"Agents {missing_agents} are not being tracked by Motive")
+        # The NatNet threads are running by now, stop them before leaving
+        qgv.pos_stream.shutdown()
         exit(1)
+    print(f"Receiving Rigid Body positions at {stream_rate:.0f} Hz")
 
 
 def set_params(scf):
@@ -181,6 +330,8 @@ def swarm_initializer():
         step, total_steps, prefix="Swarm ", suffix="[Connecting Radios...]"
     )
     qgv.swarm.open_links()
+    # Start forwarding poses, the estimator reset below needs them
+    build_pose_routes()
 
     step = print_ProgressBar(
         step, total_steps, prefix="Swarm ", suffix="[Checking Params...]"
@@ -217,6 +368,23 @@ def swarm_initializer():
 # This function closes the link between the Crazyradio PA and the crazyflie
 def quad_shutDown():
     print("Closing link and shutting position stream.")
+    # Stop forwarding poses before the links go away
+    pose_routes = qgv.pose_routes
+    qgv.pose_routes = {}
+    for cf, agent_index, send, decimator, predictor in pose_routes.values():
+        print(
+            f"Agent {qgv.AGENTS[agent_index]}: forwarded {decimator.forwarded_count} poses, "
+            f"skipped {decimator.skipped_count}"
+        )
+    stop_pose_transmitters()
+    if qgv.formation_controller != None:
+        qgv.formation_controller.stop_controller()
+        if qgv.formation_controller.stale_event_counts.any():
+            print(f"Stale position events: {qgv.formation_controller.stale_summary()}")
+    if qgv.unrouted_pose_count > 0:
+        print(f"Dropped {qgv.unrouted_pose_count} poses of untracked rigid bodies")
+    if qgv.pipeline_timer is not None:
+        print(qgv.pipeline_timer.summary())
     if qgv.swarm is not None:
         qgv.swarm.close_links()
 